@@ -0,0 +1,51 @@
+"""
+Bulk generation throughput: batch.generate_setups versus calling
+randomize_btd6_setup in a Python loop, then generate_setups_parallel by
+worker count.
+
+    python benchmarks/bench_batch.py [n]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from btd6_randomizer.batch import Constraints, generate_setups, generate_setups_parallel
+from btd6_randomizer.engine import randomize_btd6_setup
+
+SETTINGS = {
+    "default (5 towers)": Constraints(),
+    "10 towers, 3 dups": Constraints(tower_count=10, allow_duplicates=True, max_duplicates=3),
+    "CHIMPS/Deflation": Constraints(modes=("CHIMPS", "Deflation")),
+    "Magic Only, 6 towers": Constraints(modes=("Magic Only",), tower_count=6),
+}
+
+
+def main(n=1_000_000):
+    loop_n = n // 100
+    print(f"{'settings':<22} {'batch setups/s':>15} {'loop setups/s':>14}")
+    for label, c in SETTINGS.items():
+        start = time.perf_counter()
+        generate_setups(n, c, seed=0)
+        batch_rate = n / (time.perf_counter() - start)
+
+        random.seed(0)
+        start = time.perf_counter()
+        for _ in range(loop_n):
+            randomize_btd6_setup(c.modes, c.maps, c.heroes, c.tower_count, c.allow_duplicates, c.max_duplicates)
+        loop_rate = loop_n / (time.perf_counter() - start)
+        print(f"{label:<22} {batch_rate:>15,.0f} {loop_rate:>14,.0f}")
+
+    parallel_n = n * 4
+    print(f"\n{'workers':<8} {'setups/s':>12}  ({parallel_n:,} default setups)")
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        generate_setups_parallel(parallel_n, seed=0, workers=workers)
+        rate = parallel_n / (time.perf_counter() - start)
+        print(f"{workers:<8} {rate:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
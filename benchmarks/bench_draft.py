@@ -0,0 +1,64 @@
+"""
+Tournament drafts: draft.draft_setups versus rolling setups one at a time and
+throwing away any that clash (shared map or hero, or too many shared towers),
+starting over after too many clashes in a row.
+
+    python benchmarks/bench_draft.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from btd6_randomizer.draft import draft_setups
+from btd6_randomizer.engine import randomize_from_masks
+
+# Clashes in a row before the naive draft starts over
+NAIVE_PATIENCE = 1000
+NAIVE_BUDGET_S = 5.0
+
+
+def clashes(setup, taken, max_overlap):
+    _, map_choice, hero, towers = setup
+    return any(
+        map_choice is other[1] or hero == other[2] or len(set(towers) & set(other[3])) > max_overlap
+        for other in taken
+    )
+
+
+def naive_draft(players, max_overlap, rng, deadline):
+    while time.perf_counter() < deadline:
+        taken = []
+        misses = 0
+        while len(taken) < players and misses < NAIVE_PATIENCE:
+            setup = randomize_from_masks(seed=rng.getrandbits(64))
+            if clashes(setup, taken, max_overlap):
+                misses += 1
+            else:
+                taken.append(setup)
+                misses = 0
+        if len(taken) == players:
+            return taken
+    return None
+
+
+def main():
+    rng = random.Random(1)
+    print(f"{'overlap':>8} {'players':>8} {'draft ms':>10} {'naive ms':>10}")
+    for max_overlap, player_counts in ((2, (4, 8, 12, 17)), (1, (4, 8, 12, 17)), (0, (2, 4))):
+        for players in player_counts:
+            start = time.perf_counter()
+            for seed in range(20):
+                draft_setups(players, max_overlap=max_overlap, seed=seed)
+            solved = (time.perf_counter() - start) / 20 * 1000
+
+            start = time.perf_counter()
+            found = naive_draft(players, max_overlap, rng, start + NAIVE_BUDGET_S)
+            naive = f"{(time.perf_counter() - start) * 1000:.1f}" if found else f"> {NAIVE_BUDGET_S:g} s"
+            print(f"{max_overlap:>8} {players:>8} {solved:>10.2f} {naive:>10}")
+
+
+if __name__ == "__main__":
+    main()
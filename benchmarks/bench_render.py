@@ -0,0 +1,82 @@
+"""
+Render cost and HTML payload per roll: per-render PIL decode + PNG re-encode of
+the downloaded file (the old path) versus the asset store serving pre-encoded
+thumbnail variants.
+
+Uses synthetic images at the sizes the wiki CDN returns, so it runs offline:
+
+    python benchmarks/bench_render.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from btd6_randomizer import images
+from btd6_randomizer.blobcache import BlobCache
+
+# name, display width, (pixel width, pixel height) of the downloaded file
+ROLL = (
+    [("Map", 300, (1000, 640)), ("Mode", 150, (450, 450)), ("Hero", 200, (1000, 1000))]
+    + [(f"Tower {i}", 100, (450, 450)) for i in range(10)]
+)
+
+
+def make_images():
+    """
+    Put a synthetic download for every image in ROLL into images.image_cache;
+    returns the asset jobs and the downloaded files.
+    """
+    rng = random.Random(0)
+    jobs, paths = [], []
+    for name, width, size in ROLL:
+        url = f"https://example.invalid/{name.replace(' ', '')}.png"
+        extent = (-2.0 - rng.random(), -1.2, 1.0, 1.2)
+        img = Image.effect_mandelbrot(size, extent, 64).convert("RGBA")
+        buffered = BytesIO()
+        img.save(buffered, format="PNG")
+        key = images.image_cache.key(name, images.scale_wiki_image(url, images.SOURCE_WIDTH))
+        paths.append(images.image_cache.put_bytes(key, buffered.getvalue(), ".png"))
+        jobs.append((name, url, width))
+    return jobs, paths
+
+
+def per_roll(fn, rolls):
+    start = time.perf_counter()
+    for _ in range(rolls):
+        fn()
+    return (time.perf_counter() - start) / rolls * 1000
+
+
+def main(rolls=50):
+    with tempfile.TemporaryDirectory() as img_dir:
+        images.image_cache = BlobCache(img_dir)
+        jobs, paths = make_images()
+
+        before = per_roll(lambda: [images.img_to_base64(p) for p in paths], rolls)
+        before_bytes = sum(len(images.img_to_base64(p)) for p in paths)
+
+        store = images.AssetStore()
+        start = time.perf_counter()
+        for job in jobs:
+            store.get(*job)
+        build = (time.perf_counter() - start) * 1000
+        after = per_roll(lambda: [store.get(*job) for job in jobs], rolls * 100)
+        after_bytes = sum(len(store.get(*job)) for job in jobs)
+
+    print(f"images per roll:          {len(jobs)}")
+    print(f"before (PIL per render):  {before:9.3f} ms/roll")
+    print(f"asset store, first build: {build:9.3f} ms")
+    print(f"asset store, warm:        {after:9.3f} ms/roll")
+    print(f"HTML image bytes before:  {before_bytes:9d}")
+    print(f"HTML image bytes after:   {after_bytes:9d} ({images.thumbnail_format()} thumbnails)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Rerun cost per interaction in the Streamlit app, from a scripted AppTest session.
+
+A full rerun re-executes the whole script, which is what every checkbox click
+used to cost (twice for Select All/Clear All, which called st.rerun()).
+The selection panels are fragments now, so the server only reruns the
+fragment holding the widget. AppTest always reruns the whole script, so the
+fragment-scoped timings replay the fragment the way the server does.
+
+    python benchmarks/bench_rerun.py                # the app in this checkout
+    python benchmarks/bench_rerun.py --app OLD.py   # another version of the app, for before/after
+
+Images are not downloaded: ensure_image returns the remote URL.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.fragment import MemoryFragmentStorage
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest, app_test
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+from btd6_randomizer import images
+
+images.ensure_image = lambda name, url, force_download=False: url
+
+
+class FragmentScriptRunner(LocalScriptRunner):
+    """
+    LocalScriptRunner that keeps fragments between runs, records which
+    fragment drew each widget, and can rerun a single fragment.
+    """
+    storage = MemoryFragmentStorage()
+    widget_fragments = {}
+    fragment_id = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fragment_storage = FragmentScriptRunner.storage
+
+    def run(self, widget_state=None, query_params=None, timeout=3, page_hash=""):
+        if FragmentScriptRunner.fragment_id is None:
+            tree = super().run(widget_state, query_params, timeout, page_hash)
+            for msg in self.forward_msgs():
+                if msg.WhichOneof("type") != "delta" or not msg.delta.fragment_id:
+                    continue
+                element = msg.delta.new_element
+                kind = element.WhichOneof("type")
+                widget_id = getattr(getattr(element, kind), "id", None) if kind else None
+                if widget_id:
+                    FragmentScriptRunner.widget_fragments[widget_id] = msg.delta.fragment_id
+            return tree
+        self.request_rerun(RerunData(
+            widget_states=widget_state,
+            page_script_hash=page_hash,
+            fragment_id_queue=[FragmentScriptRunner.fragment_id],
+            is_fragment_scoped_rerun=True,
+        ))
+        self.start()
+        self.join()
+        return parse_tree_from_messages(self.forward_msgs())
+
+
+app_test.LocalScriptRunner = FragmentScriptRunner
+
+
+def load(app_path):
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.run()
+    return at
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def fragment_rerun(at, widget):
+    """
+    Time the rerun the server would do for an interaction with widget.
+    """
+    fragment_id = FragmentScriptRunner.widget_fragments.get(widget.id)
+    if fragment_id is None:
+        return None
+    widget_state = at._tree.get_widget_states()
+    FragmentScriptRunner.fragment_id = fragment_id
+    try:
+        return timed(lambda: at._run(widget_state))
+    finally:
+        FragmentScriptRunner.fragment_id = None
+
+
+def interactions(at):
+    """
+    (label, widget, action) for the interactions to time.
+    """
+    map_box = next(c for c in at.checkbox if c.key and c.key.startswith("map_"))
+    hero_box = next(c for c in at.checkbox if c.key and c.key.startswith("hero_"))
+    clear_maps = next(b for b in at.button if b.label.startswith("Clear All (Beginner)") and "map" in (b.key or ""))
+    tower_count = at.number_input[0]
+    return [
+        ("toggle a map", map_box, lambda w: w.uncheck()),
+        ("toggle a hero", hero_box, lambda w: w.uncheck()),
+        ("Clear All (maps)", clear_maps, lambda w: w.click()),
+        ("tower count", tower_count, lambda w: w.set_value(4)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", default=os.path.join(ROOT, "btd6_randomizer_app.py"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    app_path = os.path.abspath(args.app)
+    os.chdir(os.path.dirname(app_path))
+
+    load(app_path)  # warm imports and the catalog
+    page = [timed(lambda: load(app_path)) for _ in range(args.repeat)]
+    print(f"{os.path.basename(app_path)}: full page run {statistics.median(page):.1f} ms (median of {args.repeat})")
+    print(f"{'interaction':<18} {'full rerun':>11} {'fragment':>10}")
+
+    for i, (label, _, action) in enumerate(interactions(load(app_path))):
+        full, frag = [], []
+        for _ in range(args.repeat):
+            # Old Select All/Clear All handlers called st.rerun(); AppTest
+            # follows that within the same run(), so both passes are counted
+            at = load(app_path)
+            widget = interactions(at)[i][1]
+            full.append(timed(lambda: action(widget).run()))
+
+            at = load(app_path)
+            frag_ms = fragment_rerun(at, action(interactions(at)[i][1]))
+            if frag_ms is not None:
+                frag.append(frag_ms)
+        frag_text = f"{statistics.median(frag):.1f} ms" if frag else "-"
+        print(f"{label:<18} {statistics.median(full):>8.1f} ms {frag_text:>10}")
+
+if __name__ == "__main__":
+    main()
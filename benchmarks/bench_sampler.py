@@ -0,0 +1,50 @@
+"""
+Tower sampling: the old rejection loop (random.choice + list.count) versus
+engine.sample_towers, across pool sizes, duplicate limits and tower counts up
+to the feasibility limit.
+
+    python benchmarks/bench_sampler.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from btd6_randomizer.data import all_towers
+from btd6_randomizer.engine import sample_towers
+
+
+def rejection_sample(pool, tower_count, max_duplicates):
+    """
+    The loop randomize_btd6_setup used before; never ends if tower_count is
+    more than len(pool) * max_duplicates.
+    """
+    tower_selection = []
+    while len(tower_selection) < tower_count:
+        tower = random.choice(pool)
+        if tower_selection.count(tower) < max_duplicates:
+            tower_selection.append(tower)
+    return tower_selection
+
+
+def time_per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    print(f"{'pool':>4} {'dups':>4} {'towers':>6} {'rejection us':>13} {'sampler us':>11}")
+    for pool_size in (5, 7, 23, 25):
+        pool = tuple(all_towers[:pool_size])
+        for max_duplicates in (1, 2, 3):
+            limit = pool_size * max_duplicates
+            for tower_count in sorted({min(5, limit), min(10, limit), limit}):
+                number = 2000 if tower_count <= 10 else 200
+                old = time_per_call(lambda: rejection_sample(pool, tower_count, max_duplicates), number)
+                new = time_per_call(lambda: sample_towers(pool, tower_count, max_duplicates), number)
+                print(f"{pool_size:>4} {max_duplicates:>4} {tower_count:>6} {old:>13.2f} {new:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
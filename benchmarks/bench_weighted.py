@@ -0,0 +1,56 @@
+"""
+Weighted draws: the uniform path (random_bit) versus alias tables
+(weights.WeightedPicker) and the naive random.choices over a weight list
+rebuilt on every call, per draw and for whole rolls.
+
+    python benchmarks/bench_weighted.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from btd6_randomizer.data import maps_by_difficulty
+from btd6_randomizer.engine import ALL_MAPS, mask_ids, random_bit, randomize_from_masks
+from btd6_randomizer.weights import RollWeights, difficulty_weights
+
+MAP_WEIGHTS = difficulty_weights(maps_by_difficulty, {"Beginner": 0.5, "Advanced": 2, "Expert": 3})
+
+
+def time_per_call(fn, number=20000):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def naive_choice(weights, mask):
+    ids = mask_ids(mask)
+    return random.choices(ids, weights=[weights[i] for i in ids])[0]
+
+
+def main():
+    weights = RollWeights(maps=MAP_WEIGHTS)
+    picker = weights.map
+    by_id = picker.weights
+    half = ALL_MAPS & 0x5555555555555555555555
+
+    print(f"{'map draw':<42} {'us':>8}")
+    for label, mask in (("all maps", ALL_MAPS), ("every other map", half)):
+        picker.draw(mask)
+        print(f"  {'uniform random_bit, ' + label:<40} {time_per_call(lambda: random_bit(mask)):>8.3f}")
+        print(f"  {'alias table, ' + label:<40} {time_per_call(lambda: picker.draw(mask)):>8.3f}")
+        print(f"  {'random.choices rebuilt, ' + label:<40} {time_per_call(lambda: naive_choice(by_id, mask)):>8.3f}")
+
+    recent = RollWeights(maps=MAP_WEIGHTS, recent=10)
+
+    def recent_roll():
+        recent.record(*randomize_from_masks(weights=recent))
+
+    print(f"{'full roll':<42} {'us':>8}")
+    print(f"  {'uniform':<40} {time_per_call(randomize_from_masks):>8.2f}")
+    print(f"  {'weighted':<40} {time_per_call(lambda: randomize_from_masks(weights=weights)):>8.2f}")
+    print(f"  {'weighted, last 10 rolls at 0.25x':<40} {time_per_call(recent_roll):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
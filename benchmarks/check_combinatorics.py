@@ -0,0 +1,123 @@
+"""
+Exactness check for combinatorics: SetupSpace counts and rank/unrank against
+brute-force enumeration on random small selections.
+
+    python benchmarks/check_combinatorics.py [SELECTIONS]    # exit 1 on a mismatch
+
+For each selection, every valid (mode, map, hero, tower multiset) is listed
+straight from the rules and compared with space.total. Then every number in
+the space goes through unrank and back through rank, and the unranked setups
+must be exactly the enumerated ones. bounded_multisets, multiset_table and
+rank_multiset/unrank_multiset are checked the same way over small pools.
+Roll codes and uniform rolls depend on these, so run this after changing the
+catalog or the rules.
+"""
+import os
+import random
+import sys
+from collections import Counter
+from itertools import combinations_with_replacement
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from btd6_randomizer.combinatorics import (
+    SetupSpace, bounded_multisets, multiset_table, rank_multiset, unrank_multiset,
+)
+from btd6_randomizer.data import modes, maps, heroes, tower_order
+from btd6_randomizer.engine import RULES, TOWER_RANK, selection_mask
+
+SEED = 2024
+MAX_SPACE = 50_000
+
+
+def brute_multisets(pool, k, d):
+    return [list(c) for c in combinations_with_replacement(pool, k) if max(Counter(c).values(), default=0) <= d]
+
+
+def brute_setups(mode_names, map_choices, hero_names, tower_count, max_duplicates):
+    """
+    Every valid setup of a selection as a hashable key, straight from the rules.
+    """
+    setups = set()
+    for mode in mode_names:
+        for map_choice in map_choices:
+            rules = RULES[mode, map_choice["water"]]
+            allowed = [h for h in hero_names if h in rules.heroes]
+            for towers in brute_multisets(rules.towers, tower_count, max_duplicates):
+                for hero in allowed:
+                    setups.add(setup_key(mode, map_choice, hero, towers))
+    return setups
+
+
+def setup_key(mode, map_choice, hero, towers):
+    return mode, map_choice["name"], hero, tuple(sorted(towers, key=TOWER_RANK.__getitem__))
+
+
+def check_multisets(rng, failures):
+    for _ in range(50):
+        n = rng.randint(0, 6)
+        d = rng.randint(1, 3)
+        k = rng.randint(0, n * d + 1)
+        pool = tuple(rng.sample(tower_order, n))
+        expected = brute_multisets(pool, k, d) if k <= n * d else []
+        if bounded_multisets(n, k, d) != len(expected):
+            failures.append(f"bounded_multisets({n}, {k}, {d}) = {bounded_multisets(n, k, d)}, expected {len(expected)}")
+            continue
+        if k <= n * d and multiset_table(n, k, d)[n][k] != len(expected):
+            failures.append(f"multiset_table({n}, {k}, {d}) disagrees with bounded_multisets")
+        seen = set()
+        for r in range(len(expected)):
+            towers = unrank_multiset(pool, k, d, r)
+            seen.add(tuple(towers))
+            if rank_multiset(pool, k, d, towers) != r:
+                failures.append(f"rank_multiset(unrank_multiset({r})) != {r} for pool {pool}, k={k}, d={d}")
+                break
+        if seen != {tuple(sorted(t, key=pool.index)) for t in expected}:
+            failures.append(f"unrank_multiset doesn't cover every multiset of pool {pool}, k={k}, d={d}")
+
+
+def check_space(rng, failures):
+    mode_names = rng.sample(modes, rng.randint(1, 2))
+    map_choices = rng.sample(maps, rng.randint(1, 3))
+    hero_names = rng.sample(heroes, rng.randint(1, 3))
+    tower_count = rng.randint(1, 4)
+    max_duplicates = rng.randint(1, 3)
+    label = f"{mode_names} {[m['name'] for m in map_choices]} {hero_names} towers={tower_count} dups={max_duplicates}"
+
+    space = SetupSpace(
+        selection_mask(mode_names, "mode"), selection_mask(map_choices, "map"),
+        selection_mask(hero_names, "hero"), tower_count, max_duplicates,
+    )
+    expected = brute_setups(mode_names, map_choices, hero_names, tower_count, max_duplicates)
+    if space.total != len(expected):
+        failures.append(f"{label}: total {space.total}, enumerated {len(expected)}")
+        return 0
+    if space.total > MAX_SPACE:
+        return 0
+    unranked = set()
+    for r in range(space.total):
+        setup = space.unrank(r)
+        unranked.add(setup_key(*setup))
+        if space.rank(*setup) != r:
+            failures.append(f"{label}: rank(unrank({r})) = {space.rank(*setup)}")
+            return r
+    if unranked != expected:
+        failures.append(f"{label}: unrank doesn't produce exactly the enumerated setups")
+    return space.total
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    selections = int(argv[0]) if argv else 50
+    rng = random.Random(SEED)
+    failures = []
+    check_multisets(rng, failures)
+    round_trips = sum(check_space(rng, failures) for _ in range(selections))
+    print(f"{selections} selections, {round_trips:,} setups round-tripped, {len(failures)} failures")
+    for failure in failures[:20]:
+        print("  FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
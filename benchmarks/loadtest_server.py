@@ -0,0 +1,100 @@
+"""
+Load test for the JSON service over keep-alive connections on localhost.
+
+Starts `python -m btd6_randomizer.server` on a free port unless --port points at
+a running one, then reports throughput and client-side latency percentiles.
+
+    python benchmarks/loadtest_server.py --connections 32 --requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def client(host, port, path, requests, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    for _ in range(requests):
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run(host, port, path, connections, requests):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, path, requests, latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{len(latencies)} requests over {connections} connections in {elapsed:.2f} s")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency:    p50 {pct(0.50):.2f} ms   p99 {pct(0.99):.2f} ms   max {latencies[-1] * 1000:.2f} ms")
+
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /health HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    body = (await reader.read()).split(b"\r\n\r\n", 1)[1]
+    print("server:    ", json.loads(body))
+    writer.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(host, port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="use a server that is already running")
+    parser.add_argument("--path", default="/roll")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500, help="requests per connection")
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "-m", "btd6_randomizer.server", "--port", str(port)],
+                                  cwd=ROOT, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(args.host, port)
+        asyncio.run(run(args.host, port, args.path, args.connections, args.requests))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
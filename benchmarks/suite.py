@@ -0,0 +1,359 @@
+"""
+Benchmark suite for the engine and the image pipeline, with results saved as
+JSON so runs can be compared:
+
+    python benchmarks/suite.py --save before.json          # run everything
+    python benchmarks/suite.py -k engine --quick           # a subset, fewer repeats
+    python benchmarks/suite.py --compare before.json after.json
+
+Each benchmark is a generator registered with @bench: it does its setup,
+yields the function to time, and tears down after the yield. The runner picks
+a loop count that takes about 0.2 s (0.05 s with --quick), repeats it, and
+records per-call times; --compare reports the change in median and exits 1 if any
+benchmark got slower than --threshold.
+
+Nothing touches the network: ensure_image downloads from a local HTTP stand-in
+for the wiki CDN, and the Streamlit rerun uses remote URLs instead of images,
+including in the prefetch thread the app starts.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from btd6_randomizer.data import all_towers, maps
+from btd6_randomizer.engine import randomize_btd6_setup, sample_towers
+
+BENCHMARKS = {}
+
+
+def bench(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Skip(Exception):
+    pass
+
+
+# --- engine ---
+DRY_MAPS = [m["name"] for m in maps if not m["water"]]
+ROLL_CASES = {
+    "all": {},
+    "chimps-dry": {"selected_modes": ["CHIMPS"], "selected_maps": DRY_MAPS},
+    "primary-only": {"selected_modes": ["Primary Only"]},
+}
+
+
+def _register_rolls():
+    for label, selection in ROLL_CASES.items():
+        for max_duplicates in (1, 2, 3):
+            def roll(selection=selection, max_duplicates=max_duplicates):
+                kwargs = dict(selection, allow_duplicates=max_duplicates > 1, max_duplicates=max_duplicates)
+                yield lambda: randomize_btd6_setup(**kwargs)
+            bench(f"engine.roll[{label},dups={max_duplicates}]")(roll)
+
+
+def _register_sampler():
+    # tower_count at or just under pool * max_duplicates, where a rejection
+    # sampler would spin the longest
+    for pool_size in (5, 23):
+        pool = tuple(all_towers[:pool_size])
+        for max_duplicates in (1, 3):
+            limit = pool_size * max_duplicates
+            for tower_count in (limit - 1, limit):
+                def sample(pool=pool, tower_count=tower_count, max_duplicates=max_duplicates):
+                    yield lambda: sample_towers(pool, tower_count, max_duplicates)
+                bench(f"engine.sampler[pool={pool_size},dups={max_duplicates},towers={tower_count}]")(sample)
+
+
+@bench("engine.roll[weighted maps]")
+def weighted_roll():
+    from btd6_randomizer.data import maps_by_difficulty
+    from btd6_randomizer.engine import randomize_from_masks
+    from btd6_randomizer.weights import RollWeights, difficulty_weights
+
+    weights = RollWeights(maps=difficulty_weights(maps_by_difficulty, {"Advanced": 2, "Expert": 3}))
+    yield lambda: randomize_from_masks(weights=weights)
+
+
+@bench("engine.roll[recency]")
+def recency_roll():
+    from btd6_randomizer.engine import randomize_from_masks
+    from btd6_randomizer.weights import RollWeights
+
+    weights = RollWeights(recent=10)
+    yield lambda: weights.record(*randomize_from_masks(weights=weights))
+
+
+@bench("engine.roll[uniform]")
+def uniform_roll():
+    from btd6_randomizer.combinatorics import randomize_uniform
+
+    yield lambda: randomize_uniform(allow_duplicates=True)
+
+
+@bench("draft[17 players, overlap 1]")
+def draft_17():
+    from btd6_randomizer.draft import draft_setups
+
+    yield lambda: draft_setups(17, max_overlap=1)
+
+
+@bench("combinatorics.count[12 towers]")
+def count_setups():
+    from btd6_randomizer.combinatorics import SetupSpace
+
+    yield lambda: SetupSpace(tower_count=12, max_duplicates=3).total
+
+
+_register_rolls()
+_register_sampler()
+
+
+# --- images ---
+def synthetic_png(width: int) -> bytes:
+    from PIL import Image
+
+    img = Image.effect_mandelbrot((width, width * 2 // 3), (-2.0, -1.2, 1.0, 1.2), 64).convert("RGBA")
+    buffered = io.BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def _register_base64():
+    for width in (150, 450, 1000):
+        def encode(width=width):
+            from btd6_randomizer import images
+
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "image.png")
+                with open(path, "wb") as f:
+                    f.write(synthetic_png(width))
+                yield lambda: images.img_to_base64(path)
+        bench(f"images.img_to_base64[{width}px]")(encode)
+
+
+_register_base64()
+
+
+@contextmanager
+def cdn_stand_in(body: bytes):
+    """
+    A local HTTP server answering every GET with body, like the wiki CDN.
+    """
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def temporary_image_cache():
+    from btd6_randomizer import images
+    from btd6_randomizer.blobcache import BlobCache
+
+    saved = images.image_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        images.image_cache = BlobCache(tmp)
+        try:
+            yield images.image_cache
+        finally:
+            images.image_cache = saved
+
+
+@bench("images.ensure_image[cold]")
+def ensure_image_cold():
+    from btd6_randomizer import images
+
+    with temporary_image_cache(), cdn_stand_in(synthetic_png(450)) as base:
+        url = f"{base}/Map.png"
+        if images.ensure_image("Map", url, force_download=True) == url:
+            raise Skip("the local CDN stand-in did not answer")
+        # Every call downloads and stores the image again under the same key
+        yield lambda: images.ensure_image("Map", url, force_download=True)
+
+
+@bench("images.ensure_image[warm]")
+def ensure_image_warm():
+    from btd6_randomizer import images
+
+    with temporary_image_cache(), cdn_stand_in(synthetic_png(450)) as base:
+        url = f"{base}/Map.png"
+        images.ensure_image("Map", url)
+        yield lambda: images.ensure_image("Map", url)
+
+
+# --- Streamlit ---
+@bench("app.full_rerun")
+def app_full_rerun():
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        raise Skip("streamlit is not installed")
+    if sys.version_info < (3, 12):
+        raise Skip("the app needs Python 3.12")
+    from btd6_randomizer import images
+
+    saved = images.ensure_image, images.OFFLINE
+    images.ensure_image = lambda name, url, force_download=False: url
+    images.OFFLINE = True
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                at = AppTest.from_file(os.path.join(ROOT, "btd6_randomizer_app.py"), default_timeout=60)
+                at.run()
+                next(b for b in at.button if "Randomize" in b.label).click().run()
+                # Later runs redraw the page with the rolled setup from ?roll=
+                yield at.run
+            finally:
+                # The app starts the process-wide prefetch; it must finish with
+                # the stubs in place, or it downloads once they are restored
+                if images._prefetch is not None:
+                    images._prefetch.finished.wait()
+    finally:
+        os.chdir(cwd)
+        images.ensure_image, images.OFFLINE = saved
+
+
+# --- runner ---
+def measure(fn, min_time: float, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 10 ** 7:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.2))
+    times = [elapsed / number] + [t / number for t in timer.repeat(repeat - 1, number)]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "median_us": statistics.median(times) * 1e6,
+        "min_us": min(times) * 1e6,
+        "stdev_us": statistics.pstdev(times) * 1e6,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(pattern=None, min_time=0.2, repeat=5) -> dict:
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        steps = fn()
+        try:
+            target = next(steps)
+        except Skip as e:
+            print(f"{name:<52} skipped: {e}")
+            continue
+        try:
+            result = measure(target, min_time, repeat)
+        finally:
+            steps.close()
+        results[name] = result
+        print(f"{name:<52} {result['median_us']:>12.2f} us  (±{result['stdev_us']:.2f}, {result['number']} loops)")
+    return {"environment": environment(), "results": results}
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    with open(base_path) as f:
+        base = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    print(f"{'benchmark':<52} {'before us':>12} {'after us':>12} {'change':>8}")
+    for name in sorted(base.keys() | new.keys()):
+        if name not in base or name not in new:
+            print(f"{name:<52} {'only in ' + (base_path if name in base else new_path)}")
+            continue
+        before, after = base[name]["median_us"], new[name]["median_us"]
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  slower"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<52} {before:>12.2f} {after:>12.2f} {change:>+7.1%}{flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="shorter, noisier runs")
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two saved runs instead of running")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="median slowdown counted as a regression by --compare (default 0.10)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+    report = run(args.pattern, min_time=0.05 if args.quick else 0.2, repeat=3 if args.quick else 5)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved {len(report['results'])} results to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
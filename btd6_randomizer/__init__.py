@@ -0,0 +1,21 @@
+"""
+Support code for the BTD6 randomizer Streamlit app (btd6_randomizer_app.py).
+
+Importing the package loads the catalog, the engine and the pure-Python
+modules built on them: roll codes, weighted rolls, setup counting and
+drafts. The image pipeline (btd6_randomizer.images) and bulk generation
+(btd6_randomizer.batch) pull in their heavier dependencies when they are
+imported.
+"""
+from .combinatorics import randomize_uniform, setup_space
+from .draft import DraftImpossible, draft_setups
+from .engine import randomize_btd6_setup, randomize_from_masks
+from .rollcode import decode_roll, decode_selection, encode_roll, encode_selection
+from .weights import RollWeights, difficulty_weights
+
+__all__ = [
+    "randomize_btd6_setup", "randomize_from_masks", "randomize_uniform", "setup_space",
+    "draft_setups", "DraftImpossible",
+    "encode_roll", "decode_roll", "encode_selection", "decode_selection",
+    "RollWeights", "difficulty_weights",
+]
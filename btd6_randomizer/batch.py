@@ -0,0 +1,212 @@
+"""
+Bulk setup generation for tournament/bracket tooling.
+
+generate_setups draws many setups at once with NumPy, following the same rules
+and distribution as randomize_btd6_setup. Results are columnar: catalog indices
+into modes, maps, heroes and tower_order rather than names.
+generate_setups_parallel spreads the same work over several processes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+from .data import modes, maps, heroes, tower_order
+from .engine import HERO_ID, MAP_ID, MODE_ID, RULES, TOWER_RANK, mask_ids, mask_of
+
+# Rows per shard in generate_setups_parallel. Fixed, so the output for a seed
+# does not depend on how many workers there are.
+SHARD_SIZE = 1 << 18
+
+# Catalog indices in SetupBatch. int8 would wrap past 127 maps, heroes or towers
+ID_DTYPE = np.int16
+
+MAP_WATER = np.array([m["water"] for m in maps], dtype=bool)
+
+# Tower pool (as tower_order indices) for each mode id and has_water
+TOWER_POOLS = {
+    (MODE_ID[mode], has_water): np.array([TOWER_RANK[t] for t in rules.towers], dtype=ID_DTYPE)
+    for (mode, has_water), rules in RULES.items()
+}
+# Banned heroes (as hero indices) for each mode id and has_water
+BANNED_HERO_IDS = {
+    (MODE_ID[mode], has_water): frozenset(HERO_ID[h] for h in rules.banned_heroes)
+    for (mode, has_water), rules in RULES.items()
+}
+
+
+class Constraints(NamedTuple):
+    """
+    The same options randomize_btd6_setup takes; None means everything.
+    """
+    modes: tuple = None
+    maps: tuple = None
+    heroes: tuple = None
+    tower_count: int = 5
+    allow_duplicates: bool = False
+    max_duplicates: int = 3
+
+
+class SetupBatch(NamedTuple):
+    """
+    n setups as arrays: mode, map and hero are indices into modes, maps and
+    heroes; towers is an (n, tower_count) matrix of tower_order indices,
+    sorted within each row.
+    """
+    mode: np.ndarray
+    map: np.ndarray
+    hero: np.ndarray
+    towers: np.ndarray
+
+    def __len__(self):
+        return len(self.mode)
+
+    def setup(self, i: int):
+        """
+        Row i in the (mode, map, hero, towers) form randomize_btd6_setup returns.
+        """
+        return (
+            modes[self.mode[i]],
+            maps[self.map[i]],
+            heroes[self.hero[i]],
+            [tower_order[t] for t in self.towers[i]],
+        )
+
+
+def _ids(names, index, label):
+    return np.array(mask_ids(mask_of(names, index, label)), dtype=ID_DTYPE)
+
+
+def sample_subsets(rng, rows: int, size: int, k: int) -> np.ndarray:
+    """
+    A uniform k-subset of range(size) for each row, using Floyd's algorithm
+    column by column: k vectorized draws and no rejection.
+    """
+    chosen = np.empty((rows, k), dtype=np.int16)
+    for col, top in enumerate(range(size - k, size)):
+        pick = rng.integers(0, top + 1, size=rows, dtype=np.int16)
+        if col:
+            taken = (chosen[:, :col] == pick[:, None]).any(axis=1)
+            pick[taken] = top
+        chosen[:, col] = pick
+    return chosen
+
+
+def generate_setups(n: int, constraints=None, seed=None) -> SetupBatch:
+    """
+    Generate n setups. seed may be anything np.random.default_rng accepts
+    (an int, a SeedSequence or a Generator).
+    Raises ValueError if a drawn mode/map leaves no valid hero or not enough towers.
+    """
+    c = constraints or Constraints()
+    rng = np.random.default_rng(seed)
+
+    mode_ids = _ids(c.modes, MODE_ID, "mode") if c.modes else np.arange(len(modes), dtype=ID_DTYPE)
+    map_ids = _ids(c.maps, MAP_ID, "map") if c.maps else np.arange(len(maps), dtype=ID_DTYPE)
+    hero_ids = _ids(c.heroes, HERO_ID, "hero") if c.heroes else np.arange(len(heroes), dtype=ID_DTYPE)
+
+    mode = mode_ids[rng.integers(0, len(mode_ids), size=n)].astype(ID_DTYPE)
+    map_ = map_ids[rng.integers(0, len(map_ids), size=n)].astype(ID_DTYPE)
+
+    max_duplicates = c.max_duplicates if c.allow_duplicates else 1
+    hero = np.empty(n, dtype=ID_DTYPE)
+    towers = np.empty((n, c.tower_count), dtype=ID_DTYPE)
+
+    # Rows sharing a (mode, water) pair share their hero and tower pools
+    group = mode * 2 + MAP_WATER[map_]
+    order = np.argsort(group, kind="stable")
+    bounds = np.cumsum(np.bincount(group, minlength=len(modes) * 2))
+    start = 0
+    for g, stop in enumerate(bounds):
+        if stop == start:
+            continue
+        rows = order[start:stop]
+        start = stop
+        key = (g // 2, bool(g % 2))
+
+        banned = BANNED_HERO_IDS[key]
+        pool = np.array([h for h in hero_ids if h not in banned], dtype=ID_DTYPE)
+        if not len(pool):
+            raise ValueError(f"None of the selected heroes can be played in {modes[key[0]]} on this map.")
+        hero[rows] = pool[rng.integers(0, len(pool), size=len(rows))]
+
+        tower_pool = TOWER_POOLS[key]
+        size = len(tower_pool) * max_duplicates
+        if c.tower_count > size:
+            raise ValueError(
+                f"Can't pick {c.tower_count} towers from {len(tower_pool)} available "
+                f"with at most {max_duplicates} of each."
+            )
+        # Slot s of the multiset holds tower_pool[s // max_duplicates]
+        slots = sample_subsets(rng, len(rows), size, c.tower_count)
+        towers[rows] = tower_pool[slots // max_duplicates]
+
+    towers.sort(axis=1)
+    return SetupBatch(mode=mode, map=map_, hero=hero, towers=towers)
+
+
+# -------------------------
+# MULTI-PROCESS GENERATION
+# -------------------------
+def _views(buf, n: int, tower_count: int) -> SetupBatch:
+    """
+    SetupBatch arrays laid out back to back in one ID_DTYPE buffer.
+    """
+    flat = np.ndarray((n * (3 + tower_count),), dtype=ID_DTYPE, buffer=buf)
+    return SetupBatch(
+        mode=flat[:n],
+        map=flat[n:2 * n],
+        hero=flat[2 * n:3 * n],
+        towers=flat[3 * n:].reshape(n, tower_count),
+    )
+
+
+def _fill_shard(shm_name: str, n: int, start: int, stop: int, constraints, seed_seq):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = _views(shm.buf, n, constraints.tower_count)
+        shard = generate_setups(stop - start, constraints, seed_seq)
+        for dest, src in zip(out, shard):
+            dest[start:stop] = src
+        del out
+    finally:
+        shm.close()
+
+
+def generate_setups_parallel(n: int, constraints=None, seed=None, workers=None) -> SetupBatch:
+    """
+    Generate n setups across a process pool.
+
+    The rows are cut into SHARD_SIZE shards, and each shard draws from its own
+    child of np.random.SeedSequence(seed). So a given seed gives the same
+    setups for any number of workers. Workers write straight into one shared
+    memory block instead of pickling their results back.
+    """
+    c = constraints or Constraints()
+    shards = [(start, min(start + SHARD_SIZE, n)) for start in range(0, n, SHARD_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+
+    size = n * (3 + c.tower_count) * np.dtype(ID_DTYPE).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+    try:
+        if workers <= 1:
+            for (start, stop), seed_seq in zip(shards, seeds):
+                _fill_shard(shm.name, n, start, stop, c, seed_seq)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_fill_shard, shm.name, n, start, stop, c, seed_seq)
+                    for (start, stop), seed_seq in zip(shards, seeds)
+                ]
+                for future in futures:
+                    future.result()
+        shared = _views(shm.buf, n, c.tower_count)
+        result = SetupBatch(*(a.copy() for a in shared))
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return result
@@ -0,0 +1,187 @@
+"""
+A content-addressed file cache shared by threads and processes.
+
+Blobs are stored once under their SHA-256 (root/blobs/ab/abcd….png), and
+root/manifest.json maps cache keys to blobs. A blob is written to a temp file,
+hashed and size-checked while it streams, and only then renamed into place,
+so an interrupted download never leaves a file a later lookup would trust.
+
+The manifest is read once and then served from memory, so a hit costs no
+filesystem calls. Writers merge their changes into the file on disk under a
+lock file, so several server processes can fill the same cache.
+"""
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+MANIFEST_VERSION = 1
+
+
+class BlobCache:
+    """
+    Content-addressed blobs under root, looked up by key through a manifest.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self._entries = None
+        self._mtime = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def key(*parts) -> str:
+        """
+        A manifest key for parts such as (name, url, width); unambiguous for any strings.
+        """
+        return json.dumps(parts, ensure_ascii=False)
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest + ext)
+
+    # --- manifest ---
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self._mtime = os.fstat(f.fileno()).st_mtime_ns
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print("Ignoring unreadable image manifest:", e)
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("entries", {})
+
+    def _load(self, refresh=False) -> dict:
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read_manifest()
+            elif refresh:
+                try:
+                    mtime = os.stat(self.manifest_path).st_mtime_ns
+                except FileNotFoundError:
+                    mtime = None
+                if mtime != self._mtime:
+                    self._entries = self._read_manifest()
+            return self._entries
+
+    def _update(self, key: str, entry, merge=False):
+        """
+        Set (or, with entry None, remove) one manifest entry, in memory and on disk.
+        With merge, entry's fields are added to the existing entry, if there is one.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, "manifest.lock"), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Merge with whatever other processes wrote since we last read it
+            entries = self._read_manifest()
+            if entry is None:
+                entries.pop(key, None)
+            elif merge:
+                if key not in entries:
+                    return
+                entries[key] = {**entries[key], **entry}
+            else:
+                entries[key] = entry
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+            self._mtime = os.stat(self.manifest_path).st_mtime_ns
+            self._entries = entries
+
+    # --- lookups ---
+    def lookup(self, key: str):
+        """
+        The manifest entry for key ({"sha256", "size", "ext", ...}), or None.
+        Misses re-read the manifest if another process has changed it.
+        """
+        # _entries is replaced, never mutated, so reading it needs no lock
+        entries = self._entries if self._entries is not None else self._load()
+        entry = entries.get(key)
+        if entry is None:
+            entry = self._load(refresh=True).get(key)
+        return entry
+
+    def path(self, key: str):
+        entry = self.lookup(key)
+        return self.blob_path(entry["sha256"], entry["ext"]) if entry else None
+
+    def verify(self, key: str) -> bool:
+        """
+        Re-hash the blob for key; drops the entry if it is missing or corrupt.
+        """
+        entry = self.lookup(key)
+        if entry is None:
+            return False
+        path = self.blob_path(entry["sha256"], entry["ext"])
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+        except OSError:
+            pass
+        if size == entry["size"] and digest.hexdigest() == entry["sha256"]:
+            return True
+        # Other keys may share the blob; storing the bytes again repairs it for all of them
+        self.discard(key)
+        return False
+
+    def touch(self, key: str, **meta):
+        """
+        Update metadata fields of key's entry without rewriting its blob.
+        """
+        if self.lookup(key) is not None:
+            self._update(key, meta, merge=True)
+
+    def discard(self, key: str):
+        if self.lookup(key) is not None:
+            self._update(key, None)
+
+    # --- writes ---
+    def put_stream(self, key: str, chunks, ext: str, expected_size=None, **meta) -> str:
+        """
+        Store the bytes from chunks under key and return the blob path.
+        Raises ValueError, keeping nothing, if the data is empty or its size
+        isn't expected_size.
+        """
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, f"{os.getpid()}.{threading.get_ident()}.part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            if not size or (expected_size is not None and size != expected_size):
+                raise ValueError(f"Got {size} bytes, expected {expected_size or 'some'}")
+            sha256 = digest.hexdigest()
+            path = self.blob_path(sha256, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Replacing an existing blob is harmless (same bytes) and repairs a damaged one
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._update(key, {"sha256": sha256, "size": size, "ext": ext, **meta})
+        return path
+
+    def put_bytes(self, key: str, data: bytes, ext: str, **meta) -> str:
+        return self.put_stream(key, [data], ext, expected_size=len(data), **meta)
+
+    def __len__(self):
+        return len(self._load())
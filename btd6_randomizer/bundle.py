@@ -0,0 +1,117 @@
+"""
+Offline asset bundle: every display-ready image packed into one file.
+
+    python -m btd6_randomizer --build-bundle [PATH]     # default assets.bundle
+
+Layout: an 8-byte magic, a little-endian u32 format version and u32 index
+length, the JSON index, then the image bytes back to back. Each index row is
+[name, width, offset, length, mime, sha256], with offsets counted from the end
+of the index. At runtime the file is memory-mapped and assets are handed out
+as memoryviews into it, so startup is one open() and reading an asset copies
+nothing.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b"BTD6BNDL"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+
+
+class BundleError(ValueError):
+    pass
+
+
+class AssetBundle:
+    """
+    Read-only view of a bundle file. get() returns (memoryview, mime, sha256).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise BundleError(f"{path} is empty") from None
+        try:
+            magic, version, index_len = HEADER.unpack_from(self._mmap, 0)
+            rows = json.loads(self._mmap[HEADER.size:HEADER.size + index_len]) if magic == MAGIC else None
+        except (struct.error, ValueError):
+            magic = version = rows = None
+        if magic != MAGIC or version != VERSION or not isinstance(rows, list):
+            self._mmap.close()
+            raise BundleError(f"{path} is not a version {VERSION} asset bundle")
+        try:
+            self.index = _parse_index(rows, len(self._mmap) - HEADER.size - index_len)
+        except (TypeError, ValueError):
+            self._mmap.close()
+            raise BundleError(f"{path} has a corrupt index") from None
+        # Offsets count from the end of the index
+        self._data = memoryview(self._mmap)[HEADER.size + index_len:]
+
+    def get(self, name: str, width: int):
+        entry = self.index.get((name, width))
+        if entry is None:
+            return None
+        offset, length, mime, sha256 = entry
+        return self._data[offset:offset + length], mime, sha256
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mmap)
+
+    def close(self):
+        self._data.release()
+        self._mmap.close()
+
+
+def _parse_index(rows: list, data_len: int) -> dict:
+    """
+    {(name, width): (offset, length, mime, sha256)} from the index rows.
+    Raises ValueError or TypeError for a row that isn't one write_bundle wrote.
+    """
+    index = {}
+    for name, width, offset, length, mime, sha256 in rows:
+        if not all(isinstance(v, str) for v in (name, mime, sha256)):
+            raise TypeError("name, mime and sha256 must be strings")
+        if not all(type(v) is int for v in (width, offset, length)):
+            raise TypeError("width, offset and length must be integers")
+        if offset < 0 or length < 0 or offset + length > data_len:
+            raise ValueError("asset outside the bundle")
+        index[name, width] = (offset, length, mime, sha256)
+    return index
+
+
+def write_bundle(path: str, assets) -> int:
+    """
+    Write (name, width, data, mime) assets to path atomically; returns the count.
+    """
+    rows, blobs, offset = [], [], 0
+    for name, width, data, mime in assets:
+        rows.append([name, width, offset, len(data), mime, hashlib.sha256(data).hexdigest()])
+        blobs.append(data)
+        offset += len(data)
+    index = json.dumps(rows, ensure_ascii=False).encode()
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+            f.write(index)
+            for data in blobs:
+                f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(rows)
@@ -0,0 +1,141 @@
+"""
+Loader and validator for catalog.json, the one source of the BTD6 catalog.
+
+    python -m btd6_randomizer --check-catalog [PATH]   # exit 1 on problems
+
+catalog.json lists modes, maps, heroes and towers in catalog order (the order
+roll codes and selection bitmasks index into), each with its wiki image, plus
+the difficulty groups the app shows them in. Names are interned on load.
+"""
+import json
+import os
+import sys
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+SCHEMA = 1
+TOWER_CLASSES = ("primary", "military", "magic", "support")
+
+# Fields every entry of a section needs, and their types
+FIELDS = {
+    "modes": {"name": str, "image": str},
+    "maps": {"name": str, "water": bool, "image": str},
+    "heroes": {"name": str, "image": str},
+    "towers": {"name": str, "class": str, "image": str},
+}
+# Group tables and the section they group
+GROUPS = {"mode_groups": "modes", "map_groups": "maps"}
+
+
+class CatalogError(ValueError):
+    """
+    catalog.json is malformed; the message lists every problem found.
+    """
+
+
+def validate(catalog) -> list:
+    """
+    Every problem with a parsed catalog, as messages; empty when it is valid.
+    """
+    if not isinstance(catalog, dict):
+        return ["catalog must be a JSON object"]
+    problems = []
+    if catalog.get("schema") != SCHEMA:
+        problems.append(f"schema must be {SCHEMA}, got {catalog.get('schema')!r}")
+
+    names = {}
+    for section, fields in FIELDS.items():
+        entries = catalog.get(section)
+        if not isinstance(entries, list) or not entries:
+            problems.append(f"{section}: must be a non-empty list")
+            continue
+        seen = names[section] = set()
+        for i, entry in enumerate(entries):
+            where = f"{section}[{i}]"
+            if not isinstance(entry, dict):
+                problems.append(f"{where}: must be an object")
+                continue
+            where = f"{section}[{i}] {entry.get('name')!r}"
+            for field, kind in fields.items():
+                if field not in entry:
+                    problems.append(f"{where}: missing {field!r}")
+                elif not isinstance(entry[field], kind):
+                    problems.append(f"{where}: {field!r} must be {kind.__name__}")
+            for field in entry.keys() - fields.keys():
+                problems.append(f"{where}: unknown field {field!r}")
+            name, image = entry.get("name"), entry.get("image")
+            if isinstance(name, str):
+                if not name.strip():
+                    problems.append(f"{where}: empty name")
+                elif name in seen:
+                    problems.append(f"{where}: duplicate name")
+                seen.add(name)
+            if isinstance(image, str) and not image.startswith("https://"):
+                problems.append(f"{where}: image must be an https:// URL")
+            if section == "towers" and entry.get("class") not in TOWER_CLASSES + (None,):
+                problems.append(f"{where}: class must be one of {', '.join(TOWER_CLASSES)}")
+
+    # Towers are listed class by class, so the list is also the display order
+    classes = [t.get("class") for t in catalog.get("towers") or () if isinstance(t, dict)]
+    if all(c in TOWER_CLASSES for c in classes) and classes != sorted(classes, key=TOWER_CLASSES.index):
+        problems.append("towers: must be listed class by class (" + ", ".join(TOWER_CLASSES) + ")")
+
+    for key, section in GROUPS.items():
+        groups = catalog.get(key)
+        if not isinstance(groups, dict) or not all(isinstance(g, list) for g in groups.values()):
+            problems.append(f"{key}: must map group names to lists of {section}")
+            continue
+        known = names.get(section, set())
+        placed = {}
+        for group, members in groups.items():
+            for name in members:
+                if name not in known:
+                    problems.append(f"{key}[{group!r}]: {name!r} is not in {section}")
+                elif name in placed:
+                    problems.append(f"{key}: {name!r} is in both {placed[name]!r} and {group!r}")
+                placed.setdefault(name, group)
+        for name in sorted(known - placed.keys()):
+            problems.append(f"{key}: {name!r} is not in any group")
+    return problems
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(v) for v in value]
+    if isinstance(value, dict):
+        return {sys.intern(k): _intern(v) for k, v in value.items()}
+    return value
+
+
+def load_catalog(path=CATALOG_PATH) -> dict:
+    """
+    The parsed, validated catalog with interned strings.
+    Raises CatalogError if the file doesn't pass validate().
+    """
+    with open(path, encoding="utf-8") as f:
+        try:
+            catalog = json.load(f)
+        except json.JSONDecodeError as e:
+            raise CatalogError(f"{path}: {e}") from None
+    problems = validate(catalog)
+    if problems:
+        raise CatalogError(f"{path} has {len(problems)} problem(s):\n  " + "\n  ".join(problems))
+    return _intern(catalog)
+
+
+def check(paths=(CATALOG_PATH,)) -> int:
+    """
+    Validate catalog files and report on stdout/stderr; returns an exit status.
+    """
+    status = 0
+    for path in paths:
+        try:
+            catalog = load_catalog(path)
+        except (OSError, CatalogError) as e:
+            print(e, file=sys.stderr)
+            status = 1
+            continue
+        counts = ", ".join(f"{len(catalog[s])} {s}" for s in FIELDS)
+        print(f"{path}: ok ({counts})")
+    return status
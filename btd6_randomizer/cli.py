@@ -0,0 +1,188 @@
+"""
+Command-line roller: python -m btd6_randomizer
+
+Only needs the catalog and the engine, so it starts without importing
+Streamlit, PIL, requests or NumPy.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+
+from .catalog import CATALOG_PATH, check as check_catalog
+from .data import modes, maps, heroes
+from .draft import draft_setups
+from .engine import ALL_HEROES, ALL_MAPS, ALL_MODES, randomize_btd6_setup, selection_mask
+from .rollcode import encode_roll
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m btd6_randomizer",
+        description="Roll random BTD6 setups (mode, map, hero and towers).",
+    )
+    parser.add_argument("-n", "--count", type=int, default=1, help="number of setups to roll (default 1)")
+    parser.add_argument("--seed", type=int, help="seed for reproducible output")
+    parser.add_argument("--format", choices=("json", "csv", "code"), default="json",
+                        help="output format (default json)")
+    parser.add_argument("--mode", action="append", dest="modes", metavar="NAME",
+                        help="allowed mode; repeat for several (default all)")
+    parser.add_argument("--map", action="append", dest="maps", metavar="NAME",
+                        help="allowed map; repeat for several (default all)")
+    parser.add_argument("--hero", action="append", dest="heroes", metavar="NAME",
+                        help="allowed hero; repeat for several (default all)")
+    parser.add_argument("--towers", type=int, default=5, help="towers per setup (default 5)")
+    parser.add_argument("--max-duplicates", type=int, default=1, metavar="N",
+                        help="copies of one tower allowed per setup (default 1)")
+    parser.add_argument("--draft", type=int, metavar="PLAYERS",
+                        help="roll a tournament draft instead: PLAYERS setups with no shared map or hero")
+    parser.add_argument("--max-overlap", type=int, default=2, metavar="N",
+                        help="towers any two draft setups may share (default 2)")
+    parser.add_argument("--check-catalog", nargs="?", const=CATALOG_PATH, metavar="PATH",
+                        help="validate a catalog file (default the bundled catalog.json) and exit")
+    parser.add_argument("--build-bundle", nargs="?", const="assets.bundle", metavar="PATH",
+                        help="pack every image into an offline asset bundle (default assets.bundle) and exit")
+    parser.add_argument("--check-fairness", nargs="?", type=int, const=0, metavar="ROLLS",
+                        help="test the output distribution against the rules with ROLLS batch rolls "
+                             "per constraint set (default 4194304) and exit")
+    parser.add_argument("--revalidate-images", action="store_true",
+                        help="check every cached image against the wiki, fetching only changed ones, and exit")
+    return parser
+
+
+def check_names(parser, label, given, known):
+    unknown = [name for name in given or () if name not in known]
+    if unknown:
+        parser.error(f"unknown {label}: {', '.join(unknown)}")
+
+
+def roll_setups(count=1, seed=None, modes=None, maps=None, heroes=None, towers=5, max_duplicates=1):
+    """
+    Yield one record per setup. Every roll gets its own seed, drawn from
+    seed, so any single record can be reproduced on its own.
+    """
+    seeds = random.Random(seed)
+    for _ in range(count):
+        roll_seed = seeds.getrandbits(64)
+        mode, map_choice, hero, tower_list = randomize_btd6_setup(
+            selected_modes=modes,
+            selected_maps=maps,
+            selected_heroes=heroes,
+            tower_count=towers,
+            allow_duplicates=max_duplicates > 1,
+            max_duplicates=max_duplicates,
+            seed=roll_seed,
+        )
+        yield {
+            "mode": mode,
+            "map": map_choice["name"],
+            "water": map_choice["water"],
+            "hero": hero,
+            "towers": tower_list,
+            "code": encode_roll(mode, map_choice, hero, tower_list),
+            "seed": roll_seed,
+        }
+
+
+def draft_records(players, seed=None, modes=None, maps=None, heroes=None, towers=5, max_duplicates=1,
+                  max_overlap=2):
+    """
+    One roll_setups-style record per setup of a draft_setups draft. Every
+    record carries the draft's seed, which reproduces the whole draft.
+    """
+    draft_seed = random.getrandbits(64) if seed is None else seed
+    setups = draft_setups(
+        players,
+        mode_mask=selection_mask(modes, "mode") if modes else ALL_MODES,
+        map_mask=selection_mask(maps, "map") if maps else ALL_MAPS,
+        hero_mask=selection_mask(heroes, "hero") if heroes else ALL_HEROES,
+        tower_count=towers,
+        allow_duplicates=max_duplicates > 1,
+        max_duplicates=max_duplicates,
+        max_overlap=max_overlap,
+        seed=draft_seed,
+    )
+    return [
+        {
+            "mode": mode,
+            "map": map_choice["name"],
+            "water": map_choice["water"],
+            "hero": hero,
+            "towers": tower_list,
+            "code": encode_roll(mode, map_choice, hero, tower_list),
+            "seed": draft_seed,
+        }
+        for mode, map_choice, hero, tower_list in setups
+    ]
+
+
+def build_bundle(path) -> int:
+    # Only this command needs the image pipeline (PIL, requests)
+    from . import images
+
+    count, missing = images.build_bundle(path)
+    print(f"{path}: packed {count} images")
+    if missing:
+        print(f"could not fetch {len(missing)}: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def check_fairness(rolls, seed) -> int:
+    # NumPy is only needed here and for batch generation
+    from . import fairness
+
+    return fairness.check(rolls or fairness.BATCH_ROLLS, seed=seed or 0)
+
+
+def revalidate_images() -> int:
+    from . import images
+
+    counts = images.revalidate_images(images.image_jobs(), max_workers=images.PREFETCH_WORKERS)
+    print(", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "no images")
+    return 1 if counts.get("failed") else 0
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.check_catalog:
+        return check_catalog([args.check_catalog])
+    if args.build_bundle:
+        return build_bundle(args.build_bundle)
+    if args.check_fairness is not None:
+        return check_fairness(args.check_fairness, args.seed)
+    if args.revalidate_images:
+        return revalidate_images()
+    check_names(parser, "mode", args.modes, set(modes))
+    check_names(parser, "map", args.maps, {m["name"] for m in maps})
+    check_names(parser, "hero", args.heroes, set(heroes))
+    if args.count < 0 or args.towers < 0 or args.max_duplicates < 1:
+        parser.error("--count and --towers can't be negative, and --max-duplicates must be at least 1")
+    if args.max_overlap < 0:
+        parser.error("--max-overlap can't be negative")
+
+    out = sys.stdout
+    records = roll_setups(args.count, args.seed, args.modes, args.maps, args.heroes,
+                          args.towers, args.max_duplicates)
+    try:
+        if args.draft is not None:
+            records = draft_records(args.draft, args.seed, args.modes, args.maps, args.heroes,
+                                    args.towers, args.max_duplicates, args.max_overlap)
+        if args.format == "json":
+            json.dump(list(records), out, indent=2)
+            out.write("\n")
+        elif args.format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(["mode", "map", "water", "hero", "towers", "code", "seed"])
+            for r in records:
+                writer.writerow([r["mode"], r["map"], r["water"], r["hero"],
+                                 ";".join(r["towers"]), r["code"], r["seed"]])
+        else:
+            for r in records:
+                out.write(r["code"] + "\n")
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,246 @@
+"""
+Exact counting, ranking and uniform sampling over every valid setup.
+
+randomize_from_masks draws mode, then map, then hero, then towers, so a whole
+setup isn't uniform over the valid (mode, map, hero, tower multiset)
+combinations. For example, every mode gets the same share of rolls whatever
+its tower pool. SetupSpace numbers those combinations instead:
+
+    space = setup_space(mode_mask, map_mask, hero_mask, tower_count=5, max_duplicates=1)
+    space.total                          # how many valid setups the selection allows
+    space.unrank(space.rank(*setup))     # == setup
+    space.sample(rng)                    # uniform over all of them
+
+The space is split into one block per (mode, map has water) pair. Inside a
+block the hero pool and tower pool are fixed, so its size is
+
+    maps × heroes × multisets(pool, tower_count, max_duplicates)
+
+Counting therefore needs no enumeration. A uniform setup is one randrange
+over the total, a bisect to the block, a mixed-radix split into map and hero,
+and a multiset unrank that walks the pool once, O(pool + tower_count).
+randomize_uniform wraps that in randomize_from_masks' signature.
+"""
+import bisect
+import random
+from functools import lru_cache
+from math import comb
+
+from .data import modes, maps, heroes
+from .engine import ALL_HEROES, ALL_MAPS, ALL_MODES, HERO_ID, MAP_ID, MODE_ID, RULES, TOWER_RANK, mask_ids
+
+
+def bounded_multisets(n: int, k: int, d: int) -> int:
+    """
+    Multisets of size k from n kinds with at most d of each: the x^k
+    coefficient of (1 + x + … + x^d)^n, by inclusion-exclusion.
+    """
+    if k < 0 or k > n * d:
+        return 0
+    if not n:
+        return 1
+    return sum((-1) ** j * comb(n, j) * comb(k - j * (d + 1) + n - 1, n - 1)
+               for j in range(min(n, k // (d + 1)) + 1))
+
+
+@lru_cache(maxsize=64)
+def multiset_table(n: int, k: int, d: int) -> tuple:
+    """
+    table[i][j] = bounded_multisets(i, j, d) for i <= n and j <= k, by
+    dynamic programming over the number of copies of one more kind.
+    """
+    table = [[1] + [0] * k]
+    for _ in range(n):
+        prev = table[-1]
+        prefix = [0]
+        for value in prev:
+            prefix.append(prefix[-1] + value)
+        # Sum of prev[j - d .. j]
+        table.append([prefix[j + 1] - prefix[max(0, j - d)] for j in range(k + 1)])
+    return tuple(tuple(row) for row in table)
+
+
+def unrank_multiset(pool: tuple, k: int, d: int, r: int) -> list:
+    """
+    The r-th size-k multiset of pool (at most d of each), in the order of
+    how many copies of pool[0], then pool[1], … it holds.
+    """
+    table = multiset_table(len(pool), k, d)
+    towers = []
+    remaining = k
+    for i, tower in enumerate(pool):
+        if not remaining:
+            break
+        rest = table[len(pool) - i - 1]
+        copies = 0
+        while r >= rest[remaining - copies]:
+            r -= rest[remaining - copies]
+            copies += 1
+        towers.extend([tower] * copies)
+        remaining -= copies
+    return towers
+
+
+def rank_multiset(pool: tuple, k: int, d: int, towers) -> int:
+    """
+    Inverse of unrank_multiset. Raises ValueError if towers isn't a
+    multiset of pool with at most d of each.
+    """
+    counts = {}
+    for tower in towers:
+        counts[tower] = counts.get(tower, 0) + 1
+    if len(towers) != k or not counts.keys() <= set(pool) or max(counts.values(), default=0) > d:
+        raise ValueError("Those towers can't be rolled with this selection.")
+    table = multiset_table(len(pool), k, d)
+    r = 0
+    remaining = k
+    for i, tower in enumerate(pool):
+        rest = table[len(pool) - i - 1]
+        for copies in range(counts.get(tower, 0)):
+            r += rest[remaining - copies]
+        remaining -= counts.get(tower, 0)
+    return r
+
+
+class Block:
+    __slots__ = ("mode", "map_ids", "hero_ids", "towers", "tower_sets", "size")
+
+    def __init__(self, mode, map_ids, hero_ids, towers, tower_sets):
+        self.mode = mode
+        self.map_ids = map_ids
+        self.hero_ids = hero_ids
+        self.towers = towers
+        self.tower_sets = tower_sets
+        self.size = len(map_ids) * len(hero_ids) * tower_sets
+
+
+class SetupSpace:
+    """
+    The valid setups for a selection, numbered 0 .. total - 1.
+    """
+    def __init__(self, mode_mask=ALL_MODES, map_mask=ALL_MAPS, hero_mask=ALL_HEROES,
+                 tower_count=5, max_duplicates=1):
+        self.tower_count = tower_count
+        self.max_duplicates = max_duplicates
+        map_ids = mask_ids(map_mask & ALL_MAPS)
+        by_water = {
+            water: tuple(i for i in map_ids if maps[i]["water"] == water)
+            for water in (False, True)
+        }
+        self.blocks = []
+        self.starts = []
+        self.total = 0
+        for mode_id in mask_ids(mode_mask & ALL_MODES):
+            for water, water_maps in by_water.items():
+                rules = RULES[modes[mode_id], water]
+                block = Block(
+                    mode_id, water_maps, mask_ids(hero_mask & rules.hero_mask), rules.towers,
+                    bounded_multisets(len(rules.towers), tower_count, max_duplicates),
+                )
+                if block.size:
+                    self.starts.append(self.total)
+                    self.blocks.append(block)
+                    self.total += block.size
+
+    def __len__(self):
+        # len() must fit in an index; total can be far bigger
+        return min(self.total, 2 ** 63 - 1)
+
+    def unrank(self, r: int):
+        """
+        Setup number r, as (mode, map, hero, towers) like randomize_from_masks.
+        """
+        if not 0 <= r < self.total:
+            raise IndexError(f"Setup number must be below {self.total}")
+        b = bisect.bisect_right(self.starts, r) - 1
+        block = self.blocks[b]
+        r -= self.starts[b]
+        r, tower_rank = divmod(r, block.tower_sets)
+        map_index, hero_index = divmod(r, len(block.hero_ids))
+        towers = unrank_multiset(block.towers, self.tower_count, self.max_duplicates, tower_rank)
+        return modes[block.mode], maps[block.map_ids[map_index]], heroes[block.hero_ids[hero_index]], towers
+
+    def rank(self, mode, map_choice, hero, towers) -> int:
+        """
+        The number of a setup. Raises ValueError if the selection can't roll it.
+        """
+        map_id = MAP_ID[map_choice["name"] if isinstance(map_choice, dict) else map_choice]
+        mode_id, hero_id = MODE_ID[mode], HERO_ID[hero]
+        towers = sorted(towers, key=TOWER_RANK.__getitem__)
+        for start, block in zip(self.starts, self.blocks):
+            if block.mode == mode_id and map_id in block.map_ids:
+                if hero_id not in block.hero_ids:
+                    break
+                tower_rank = rank_multiset(block.towers, self.tower_count, self.max_duplicates, towers)
+                index = block.map_ids.index(map_id) * len(block.hero_ids) + block.hero_ids.index(hero_id)
+                return start + index * block.tower_sets + tower_rank
+        raise ValueError("That setup can't be rolled with this selection.")
+
+    def sample(self, rng=random):
+        """
+        A setup drawn uniformly from all total of them.
+        Raises ValueError if the selection allows none.
+        """
+        if not self.total:
+            raise ValueError("No valid setup fits this selection.")
+        return self.unrank(rng.randrange(self.total))
+
+
+@lru_cache(maxsize=64)
+def setup_space(mode_mask=ALL_MODES, map_mask=ALL_MAPS, hero_mask=ALL_HEROES,
+                tower_count=5, max_duplicates=1) -> SetupSpace:
+    """
+    SetupSpace for a selection, cached since a session keeps rolling with the same one.
+    """
+    return SetupSpace(mode_mask, map_mask, hero_mask, tower_count, max_duplicates)
+
+
+def randomize_uniform(
+    mode_mask=ALL_MODES,
+    map_mask=ALL_MAPS,
+    hero_mask=ALL_HEROES,
+    tower_count=5,
+    allow_duplicates=False,
+    max_duplicates=3,
+    seed=None,
+    cooldown=None
+):
+    """
+    randomize_from_masks with every valid setup equally likely. A mode whose
+    pool can't hold tower_count towers is skipped instead of failing the roll.
+    cooldown works as it does there; if the maps and heroes it leaves can't
+    make a setup, it is ignored for this roll.
+    """
+    rng = random if seed is None else random.Random(seed)
+    if not mode_mask & ALL_MODES or not map_mask & ALL_MAPS:
+        raise ValueError("Select at least one mode and one map.")
+    max_duplicates = max_duplicates if allow_duplicates else 1
+    space = setup_space(mode_mask & ALL_MODES, map_mask & ALL_MAPS, hero_mask & ALL_HEROES,
+                        tower_count, max_duplicates)
+    if cooldown is None:
+        return space.sample(rng)
+    allowed = setup_space(mode_mask & ALL_MODES, cooldown.allowed_maps(map_mask & ALL_MAPS),
+                          cooldown.allowed_heroes(hero_mask & ALL_HEROES), tower_count, max_duplicates)
+    if allowed.total:
+        space = allowed
+    setup = space.sample(rng)
+    for _ in range(cooldown.MAX_TOWER_REDRAWS):
+        if not cooldown.repeats_towers(setup[3]):
+            break
+        setup = space.sample(rng)
+    return setup
+
+
+def describe_count(n: int) -> str:
+    """
+    A count for people: 12,345 / 3.2 million / 4.1 billion / 7.5 × 10^18.
+    """
+    if n < 1_000_000:
+        return f"{n:,}"
+    # Pick the unit after rounding, so 999.96 million reads "1.0 billion"
+    for value, name in ((10 ** 6, "million"), (10 ** 9, "billion"), (10 ** 12, "trillion")):
+        scaled = round(n / value, 1)
+        if scaled < 1000:
+            return f"{scaled:.1f} {name}"
+    mantissa, exponent = f"{n:.1e}".split("e")
+    return f"{mantissa} × 10^{int(exponent)}"
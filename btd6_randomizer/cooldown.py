@@ -0,0 +1,171 @@
+"""
+No-repeat cooldown: keep maps, heroes and tower sets from the last N rolls
+out of the next one.
+
+    cooldown = Cooldown(10)
+    setup = randomize_from_masks(..., cooldown=cooldown)
+    cooldown.record(*setup)
+
+The last N rolls sit in a fixed-size ring. Each map and hero keeps a count of
+how many of those rolls it was in, and the ones with a non-zero count form
+the blocked_maps / blocked_heroes bitmasks the engine masks its draws with.
+Recent tower sets are counted the same way in a dict. record() only
+adjusts the entry that leaves the ring and the one that enters it, so a roll
+costs O(1) whatever N is.
+
+If a selection has nothing left that isn't blocked, the items seen longest
+ago are allowed, so rolls cycle through a small selection instead of failing.
+
+to_code() packs the ring into a short code (the same versioned base32 as
+roll codes), which the app keeps in the page URL so a reload doesn't reset it.
+"""
+from .data import maps, heroes, tower_order
+from .engine import HERO_ID, MAP_ID, TOWER_RANK, mask_ids
+from .rollcode import CODE_VERSION, MAX_CODE_TOWERS, from_base32, to_base32
+
+MAX_WINDOW = 50
+
+
+class Cooldown:
+    """
+    The last `window` rolls, and which maps, heroes and tower sets they block.
+    maps, heroes and towers switch the exclusion for each section; rolls are
+    recorded in full either way.
+    """
+    # Tower redraws before a repeated set is accepted (only likely with tiny pools)
+    MAX_TOWER_REDRAWS = 20
+
+    def __init__(self, window: int, maps=True, heroes=True, towers=True):
+        if not 0 <= window <= MAX_WINDOW:
+            raise ValueError(f"Cooldown window must be between 0 and {MAX_WINDOW}")
+        self.window = window
+        self.maps, self.heroes, self.towers = maps, heroes, towers
+        self._ring = [None] * window   # (map_id, hero_id, tower ranks)
+        self._next = 0
+        self._len = 0
+        self._serial = 0
+        self._map_count = [0] * len(MAP_ID)
+        self._hero_count = [0] * len(HERO_ID)
+        self._map_seen = [-1] * len(MAP_ID)
+        self._hero_seen = [-1] * len(HERO_ID)
+        self._tower_sets = {}
+        self.blocked_maps = 0
+        self.blocked_heroes = 0
+
+    def __len__(self):
+        return self._len
+
+    def entries(self) -> list:
+        """
+        The recorded (map_id, hero_id, tower ranks), oldest first.
+        """
+        start = (self._next - self._len) % self.window if self.window else 0
+        return [self._ring[(start + i) % self.window] for i in range(self._len)]
+
+    # --- recording ---
+    def record(self, mode, map_choice, hero, towers):
+        """
+        Record a rolled setup (as randomize_from_masks returns it).
+        """
+        self._push(MAP_ID[map_choice["name"]], HERO_ID[hero], tuple(sorted(TOWER_RANK[t] for t in towers)))
+
+    def _push(self, map_id: int, hero_id: int, tower_key: tuple):
+        self._serial += 1
+        self._map_seen[map_id] = self._serial
+        self._hero_seen[hero_id] = self._serial
+        if not self.window:
+            return
+        if self._len == self.window:
+            self._drop(self._ring[self._next])
+        else:
+            self._len += 1
+        self._ring[self._next] = (map_id, hero_id, tower_key)
+        self._next = (self._next + 1) % self.window
+
+        self._map_count[map_id] += 1
+        self.blocked_maps |= 1 << map_id
+        self._hero_count[hero_id] += 1
+        self.blocked_heroes |= 1 << hero_id
+        self._tower_sets[tower_key] = self._tower_sets.get(tower_key, 0) + 1
+
+    def _drop(self, entry):
+        map_id, hero_id, tower_key = entry
+        self._map_count[map_id] -= 1
+        if not self._map_count[map_id]:
+            self.blocked_maps &= ~(1 << map_id)
+        self._hero_count[hero_id] -= 1
+        if not self._hero_count[hero_id]:
+            self.blocked_heroes &= ~(1 << hero_id)
+        self._tower_sets[tower_key] -= 1
+        if not self._tower_sets[tower_key]:
+            del self._tower_sets[tower_key]
+
+    # --- exclusion ---
+    @staticmethod
+    def _allowed(mask: int, blocked: int, seen: list) -> int:
+        allowed = mask & ~blocked
+        if allowed or not mask:
+            return allowed
+        # Everything selected is on cooldown: allow what was seen longest ago
+        ids = mask_ids(mask)
+        oldest = min(seen[i] for i in ids)
+        return sum(1 << i for i in ids if seen[i] == oldest)
+
+    def allowed_maps(self, mask: int) -> int:
+        return self._allowed(mask, self.blocked_maps, self._map_seen) if self.maps else mask
+
+    def allowed_heroes(self, mask: int) -> int:
+        return self._allowed(mask, self.blocked_heroes, self._hero_seen) if self.heroes else mask
+
+    def repeats_towers(self, towers) -> bool:
+        """
+        Whether towers (in tower_order) is a set from the window.
+        """
+        return self.towers and tuple(TOWER_RANK[t] for t in towers) in self._tower_sets
+
+    # --- serialized form ---
+    def to_code(self) -> str:
+        value = 0
+        for map_id, hero_id, tower_key in reversed(self.entries()):
+            for rank in reversed(tower_key):
+                value = value * len(tower_order) + rank
+            value = value * (MAX_CODE_TOWERS + 1) + len(tower_key)
+            value = value * len(heroes) + hero_id
+            value = value * len(maps) + map_id
+        value = value * (MAX_WINDOW + 1) + self._len
+        value = value * (MAX_WINDOW + 1) + self.window
+        return CODE_VERSION + to_base32(value)
+
+    @classmethod
+    def from_code(cls, code: str, **sections):
+        """
+        The Cooldown a to_code() code stands for; sections are the maps,
+        heroes and towers switches. Raises ValueError for a bad code.
+        """
+        value = from_base32(code, "cooldown code")
+        value, window = divmod(value, MAX_WINDOW + 1)
+        value, count = divmod(value, MAX_WINDOW + 1)
+        if count > window:
+            raise ValueError("Cooldown code is malformed.")
+        cooldown = cls(window, **sections)
+        for _ in range(count):
+            value, map_id = divmod(value, len(maps))
+            value, hero_id = divmod(value, len(heroes))
+            value, tower_count = divmod(value, MAX_CODE_TOWERS + 1)
+            ranks = []
+            for _ in range(tower_count):
+                value, rank = divmod(value, len(tower_order))
+                ranks.append(rank)
+            cooldown._push(map_id, hero_id, tuple(ranks))
+        if value:
+            raise ValueError("Cooldown code is too long.")
+        return cooldown
+
+    def resized(self, window: int):
+        """
+        A copy with a different window, keeping the most recent rolls that fit.
+        """
+        cooldown = Cooldown(window, self.maps, self.heroes, self.towers)
+        for entry in self.entries()[-window:] if window else ():
+            cooldown._push(*entry)
+        return cooldown
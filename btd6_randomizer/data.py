@@ -0,0 +1,41 @@
+"""
+Static BTD6 catalog: modes, maps, heroes, towers and their wiki images.
+
+The tables are built from catalog.json, which is checked by
+btd6_randomizer.catalog when it is loaded.
+"""
+from .catalog import load_catalog
+
+_catalog = load_catalog()
+
+modes = [m["name"] for m in _catalog["modes"]]
+
+maps = [{"name": m["name"], "water": m["water"]} for m in _catalog["maps"]]
+
+heroes = [h["name"] for h in _catalog["heroes"]]
+
+maps_images = {m["name"]: m["image"] for m in _catalog["maps"]}
+
+mode_images = {m["name"]: m["image"] for m in _catalog["modes"]}
+
+hero_images = {h["name"]: h["image"] for h in _catalog["heroes"]}
+
+tower_images = {t["name"]: t["image"] for t in _catalog["towers"]}
+
+primary_towers = [t["name"] for t in _catalog["towers"] if t["class"] == "primary"]
+
+military_towers = [t["name"] for t in _catalog["towers"] if t["class"] == "military"]
+
+magic_towers = [t["name"] for t in _catalog["towers"] if t["class"] == "magic"]
+
+support_towers = [t["name"] for t in _catalog["towers"] if t["class"] == "support"]
+
+all_towers = primary_towers + military_towers + magic_towers + support_towers
+
+tower_order = primary_towers + military_towers + magic_towers + support_towers
+
+# Modes by difficulty
+modes_by_difficulty = _catalog["mode_groups"]
+
+# Maps by difficulty
+maps_by_difficulty = _catalog["map_groups"]
@@ -0,0 +1,369 @@
+"""
+Tournament drafts: N setups drawn together so that they don't clash.
+
+    setups = draft_setups(8, max_overlap=2, seed=42)
+
+Each setup follows the usual rules. On top of that, no two setups share a map,
+no hero is used twice, and any two setups have at most max_overlap tower types
+in common.
+
+Rolling setups one at a time and throwing away clashes slows down fast as N
+grows, and it can't tell a tight draft from an impossible one. Instead the
+draft is solved in two steps:
+
+1. Maps and heroes. A map and a hero fit together if some selected mode allows
+   that hero on that map and has room for tower_count towers. Giving N setups
+   distinct maps and distinct heroes is then a bipartite matching, found with
+   augmenting paths over per-map hero bitmasks. If the maximum matching is
+   smaller than N, no draft exists.
+2. Towers. Every setup needs at least ceil(tower_count / max_duplicates)
+   tower types. Counting bounds rule out some drafts up front: spreading
+   those types over the available towers forces at least a certain number of
+   shared pairs, both over all pools together and within each pool, and two
+   small pools can force too much overlap between any setups drawn from them.
+   max_setups combines the last two into a bound on the number of setups
+   any mode assignment can serve. Otherwise a depth-first search picks each setup's types as a
+   bitmask over tower_order, most constrained setup first. A type is pruned
+   once taking it would push the overlap with an earlier setup past the
+   limit. After each setup, the later ones are checked to still have enough
+   usable types (forward checking).
+
+Modes are assigned between the two steps: at random per setup, but avoiding
+pools that the counting bound already rules out. The search first aims for as
+many tower types per setup as a plain roll would have, then settles for the
+fewest that fit. It is bounded by MAX_NODES. When it runs out, the draft is
+retried with a fresh matching and fresh modes, up to MAX_ATTEMPTS times.
+DraftImpossible means no draft exists. A plain ValueError means the search
+didn't find one.
+"""
+import random
+
+from .data import modes, maps, heroes, tower_order
+from .engine import ALL_HEROES, ALL_MAPS, ALL_MODES, RULES, TOWER_RANK, mask_ids, sample_towers
+
+# Tower types tried per attempt before starting over
+MAX_NODES = 20000
+MAX_ATTEMPTS = 8
+
+# Tower pool of each (mode id, has_water) as a bitmask over tower_order
+POOL_MASKS = {
+    (i, has_water): sum(1 << TOWER_RANK[t] for t in RULES[mode, has_water].towers)
+    for i, mode in enumerate(modes)
+    for has_water in (False, True)
+}
+
+
+class DraftImpossible(ValueError):
+    """
+    No draft meets the constraints, whatever the search tries.
+    """
+
+
+class _OutOfNodes(Exception):
+    pass
+
+
+def _fitting_modes(mode_mask: int, tower_count: int, max_duplicates: int) -> dict:
+    """
+    {has_water: [mode ids]} of the selected modes with room for tower_count towers.
+    """
+    return {
+        has_water: [i for i in mask_ids(mode_mask)
+                    if POOL_MASKS[i, has_water].bit_count() * max_duplicates >= tower_count]
+        for has_water in (False, True)
+    }
+
+
+def hero_options(map_mask: int, hero_mask: int, fitting: dict) -> dict:
+    """
+    {map id: bitmask of the selected heroes some fitting mode allows on it}.
+    """
+    allowed = {water: 0 for water in fitting}
+    for water, mode_ids in fitting.items():
+        for mode_id in mode_ids:
+            allowed[water] |= RULES[modes[mode_id], water].hero_mask & hero_mask
+    return {
+        map_id: allowed[maps[map_id]["water"]]
+        for map_id in mask_ids(map_mask) if allowed[maps[map_id]["water"]]
+    }
+
+
+def match_maps(options: dict, needed: int, rng=random) -> dict:
+    """
+    A random matching of maps to distinct heroes, {map id: hero id}, with
+    `needed` pairs, or a maximum matching if that's fewer.
+
+    Maps are taken in random order. A map gets a random free hero when it has
+    one, and otherwise an augmenting path over the hero bitmasks.
+    """
+    owner = {}   # hero id -> map id
+    matched = 0  # heroes in owner, as a bitmask
+
+    def augment(map_id, visited):
+        for hero_id in mask_ids(options[map_id] & ~visited[0]):
+            if visited[0] >> hero_id & 1:
+                continue
+            visited[0] |= 1 << hero_id
+            if hero_id not in owner or augment(owner[hero_id], visited):
+                owner[hero_id] = map_id
+                return True
+        return False
+
+    map_ids = list(options)
+    rng.shuffle(map_ids)
+    for map_id in map_ids:
+        if len(owner) == needed:
+            break
+        free = options[map_id] & ~matched
+        if free:
+            owner[rng.choice(mask_ids(free))] = map_id
+        elif not augment(map_id, [0]):
+            continue
+        matched = sum(1 << hero_id for hero_id in owner)
+    return {map_id: hero_id for hero_id, map_id in owner.items()}
+
+
+def min_shared_pairs(players: int, types: int, universe: int) -> int:
+    """
+    The fewest (pair of setups, shared tower) incidences possible when each
+    of `players` setups uses `types` of `universe` towers: the tower uses
+    spread as evenly as they can be.
+    """
+    q, r = divmod(players * types, universe)
+    return r * (q + 1) * q // 2 + (universe - r) * q * (q - 1) // 2
+
+
+def crowding_fits(n: int, pool: int, min_types: int, max_overlap: int) -> bool:
+    """
+    Whether n setups can take min_types types each from the same pool as far
+    as the counting bound can tell.
+    """
+    return min_shared_pairs(n, min_types, pool.bit_count()) <= n * (n - 1) // 2 * max_overlap
+
+
+def pools_fit(pool: int, other: int, min_types: int, max_overlap: int) -> bool:
+    """
+    Whether a setup from pool and one from other can share at most
+    max_overlap types: two min_types-type sets overlap in at least
+    2 * min_types - |pool | other| of them.
+    """
+    return 2 * min_types - (pool | other).bit_count() <= max_overlap
+
+
+def max_setups(pools, min_types: int, max_overlap: int, limit: int) -> int:
+    """
+    An upper bound, capped at limit, on how many setups the tower step can
+    serve when each may use any of pools. Each pool holds setups up to the
+    first count the counting bound rules out, and pools that don't fit
+    together can't both be used; the best compatible set of pools is found
+    by trying them all (there are only a handful of distinct pools).
+    """
+    pools = sorted(set(pools))
+    capacity = []
+    for pool in pools:
+        n = 1
+        while n < limit and crowding_fits(n + 1, pool, min_types, max_overlap) \
+                and pools_fit(pool, pool, min_types, max_overlap):
+            n += 1
+        capacity.append(n)
+
+    best = 0
+
+    def extend(start, used, total):
+        nonlocal best
+        best = max(best, total)
+        for k in range(start, len(pools)):
+            if best >= limit:
+                return
+            if all(pools_fit(pools[k], pools[j], min_types, max_overlap) for j in used):
+                extend(k + 1, used + [k], total + capacity[k])
+
+    extend(0, [], 0)
+    return min(best, limit)
+
+
+def assign_modes(slots, fitting: dict, min_types: int, max_overlap: int, rng=random) -> list:
+    """
+    A mode id for each (map id, hero id) slot, at random among the fitting
+    modes that allow the hero there. Modes that would already make the tower
+    step impossible are avoided when something else is left: a pool too
+    crowded for the counting bound, or two pools too small to keep
+    min_types-type sets within max_overlap of each other.
+    """
+    crowding = {}   # pool mask -> setups given it so far
+    mode_ids = []
+
+    def fits(pool):
+        if not crowding_fits(crowding.get(pool, 0) + 1, pool, min_types, max_overlap):
+            return False
+        return all(pools_fit(pool, other, min_types, max_overlap) for other in crowding)
+
+    for map_id, hero_id in slots:
+        water = maps[map_id]["water"]
+        allowed = [i for i in fitting[water] if RULES[modes[i], water].hero_mask >> hero_id & 1]
+        mode_id = rng.choice([i for i in allowed if fits(POOL_MASKS[i, water])] or allowed)
+        pool = POOL_MASKS[mode_id, water]
+        crowding[pool] = crowding.get(pool, 0) + 1
+        mode_ids.append(mode_id)
+    return mode_ids
+
+
+def pick_tower_types(pools: list, sizes: list, max_overlap: int, rng=random, max_nodes=MAX_NODES) -> list:
+    """
+    A tower type bitmask per setup: sizes[i] types from pools[i], any two
+    sharing at most max_overlap. None if there is none; raises _OutOfNodes
+    past max_nodes.
+    """
+    n = len(pools)
+    chosen = [0] * n
+    order = sorted(range(n), key=lambda i: (pools[i].bit_count(), rng.random()))
+    # Each setup tries its types in its own random order
+    shuffled = [rng.sample(mask_ids(pool), pool.bit_count()) for pool in pools]
+    nodes = 0
+
+    def room(i, placed) -> int:
+        # Most types setup i can still take: all the untouched ones, plus at
+        # most max_overlap from each placed setup
+        used = 0
+        shared = 0
+        for j in placed:
+            used |= chosen[j]
+            shared += min(max_overlap, (pools[i] & chosen[j]).bit_count())
+        return (pools[i] & ~used).bit_count() + min(shared, (pools[i] & used).bit_count())
+
+    def place(p) -> bool:
+        if p == n:
+            return True
+        i = order[p]
+        placed = order[:p]
+        blocked = 0
+        if not max_overlap:
+            for j in placed:
+                blocked |= chosen[j]
+        return choose(p, i, placed, 0, pools[i] & ~blocked, sizes[i])
+
+    def choose(p, i, placed, types, candidates, needed) -> bool:
+        nonlocal nodes
+        if not needed:
+            chosen[i] = types
+            if all(room(q, order[:p + 1]) >= sizes[q] for q in order[p + 1:]) and place(p + 1):
+                return True
+            chosen[i] = 0
+            return False
+        for t in shuffled[i]:
+            if not candidates >> t & 1:
+                continue
+            if candidates.bit_count() < needed:
+                return False
+            nodes += 1
+            if nodes > max_nodes:
+                raise _OutOfNodes
+            bit = 1 << t
+            candidates &= ~bit
+            grown = types | bit
+            blocked = 0
+            for j in placed:
+                if (grown & chosen[j]).bit_count() >= max_overlap:
+                    blocked |= chosen[j]
+            if choose(p, i, placed, grown, candidates & ~blocked, needed - 1):
+                return True
+        return False
+
+    return chosen if place(0) else None
+
+
+def _fill(types: int, tower_count: int, max_duplicates: int, rng) -> list:
+    """
+    tower_count towers using every type in the bitmask, at most max_duplicates of each.
+    """
+    ranks = mask_ids(types)
+    copies = [1] * len(ranks)
+    for _ in range(tower_count - len(ranks)):
+        copies[rng.choice([i for i, c in enumerate(copies) if c < max_duplicates])] += 1
+    return [tower_order[t] for t, c in zip(ranks, copies) for _ in range(c)]
+
+
+def draft_setups(
+    players,
+    mode_mask=ALL_MODES,
+    map_mask=ALL_MAPS,
+    hero_mask=ALL_HEROES,
+    tower_count=5,
+    allow_duplicates=False,
+    max_duplicates=3,
+    max_overlap=2,
+    seed=None
+) -> list:
+    """
+    `players` setups, as randomize_from_masks returns them, with distinct
+    maps, distinct heroes and at most max_overlap tower types shared by any
+    two. Raises DraftImpossible if no such draft exists, and ValueError if
+    none was found within the search limit.
+    """
+    rng = random if seed is None else random.Random(seed)
+    mode_mask &= ALL_MODES
+    map_mask &= ALL_MAPS
+    hero_mask &= ALL_HEROES
+    if not mode_mask or not map_mask:
+        raise ValueError("Select at least one mode and one map.")
+    if players < 1:
+        raise ValueError("A draft needs at least one player.")
+    max_duplicates = max_duplicates if allow_duplicates else 1
+
+    fitting = _fitting_modes(mode_mask, tower_count, max_duplicates)
+    options = hero_options(map_mask, hero_mask, fitting)
+    matched = match_maps(options, players, rng)
+    if len(matched) < players:
+        raise DraftImpossible(
+            f"At most {len(matched)} setups can have different maps and heroes with this selection."
+        )
+
+    min_types = -(-tower_count // max_duplicates)
+    pools = [
+        POOL_MASKS[mode_id, water]
+        for water in {maps[map_id]["water"] for map_id in options}
+        for mode_id in fitting[water]
+        if RULES[modes[mode_id], water].hero_mask & hero_mask
+    ]
+    universe = 0
+    for pool in pools:
+        universe |= pool
+    if not crowding_fits(players, universe, min_types, max_overlap):
+        raise DraftImpossible(
+            f"{players} setups of {tower_count} towers can't keep to {max_overlap} shared "
+            f"towers per pair with this selection."
+        )
+    most = max_setups(pools, min_types, max_overlap, players)
+    if most < players:
+        raise DraftImpossible(
+            f"At most {most} setups of {tower_count} towers can keep to {max_overlap} shared "
+            f"towers per pair with this selection."
+        )
+
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            matched = match_maps(options, players, rng)
+        slots = list(matched.items())
+        rng.shuffle(slots)
+        mode_ids = assign_modes(slots, fitting, min_types, max_overlap, rng)
+        rules = [RULES[modes[mode_id], maps[map_id]["water"]] for mode_id, (map_id, _) in zip(mode_ids, slots)]
+        pools = [POOL_MASKS[mode_id, maps[map_id]["water"]] for mode_id, (map_id, _) in zip(mode_ids, slots)]
+        # Aim for as many types as a plain roll would have, then settle for fewer
+        natural = [len(set(sample_towers(r.towers, tower_count, max_duplicates, rng))) for r in rules]
+        tries = [(natural, MAX_NODES)]
+        if max(natural) > min_types:
+            tries = [(natural, MAX_NODES // 10), ([min_types] * players, MAX_NODES)]
+        for sizes, max_nodes in tries:
+            try:
+                types = pick_tower_types(pools, sizes, max_overlap, rng, max_nodes)
+            except _OutOfNodes:
+                continue
+            if types is not None:
+                return [
+                    (modes[mode_id], maps[map_id], heroes[hero_id], _fill(t, tower_count, max_duplicates, rng))
+                    for mode_id, (map_id, hero_id), t in zip(mode_ids, slots, types)
+                ]
+    raise ValueError(
+        f"Couldn't find {players} setups sharing at most {max_overlap} towers per pair. "
+        "Try fewer players or allow more shared towers."
+    )
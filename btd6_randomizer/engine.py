@@ -0,0 +1,253 @@
+"""
+The randomizer engine: game rules compiled into lookup tables and catalog
+bitmasks, and randomize_btd6_setup which draws a setup from them.
+"""
+import random
+from functools import lru_cache
+from typing import NamedTuple
+
+from .data import (
+    modes, maps, heroes, primary_towers, military_towers, magic_towers,
+    all_towers, tower_order
+)
+
+# -------------------------
+# RULES
+# -------------------------
+# Towers and heroes that need water on the map
+WATER_TOWERS = frozenset({"Monkey Sub", "Monkey Buccaneer"})
+WATER_HEROES = frozenset({"Admiral Brickell"})
+
+# Modes restricted to one tower class
+MODE_TOWER_CLASSES = {
+    "Primary Only": primary_towers,
+    "Military Only": military_towers,
+    "Magic Only": magic_towers,
+}
+
+MODE_BANNED_TOWERS = {
+    "CHIMPS": frozenset({"Banana Farm"}),
+    "Deflation": frozenset({"Banana Farm"}),
+}
+
+MODE_BANNED_HEROES = {
+    "CHIMPS": frozenset({"Benjamin"}),
+    "Deflation": frozenset({"Benjamin"}),
+}
+
+
+# Catalog indices, shared by the batch generator and roll codes. A selection
+# of modes, maps or heroes is a bitmask over these: bit i is entry i.
+MODE_ID = {name: i for i, name in enumerate(modes)}
+MAP_ID = {m["name"]: i for i, m in enumerate(maps)}
+HERO_ID = {name: i for i, name in enumerate(heroes)}
+TOWER_RANK = {t: i for i, t in enumerate(tower_order)}
+MAP_BY_NAME = {m["name"]: m for m in maps}
+
+
+def mask_of(names, index, label="name") -> int:
+    """
+    The bitmask for a list of catalog names. Raises ValueError for unknown names.
+    """
+    mask = 0
+    for name in names:
+        if isinstance(name, dict):
+            name = name["name"]
+        i = index.get(name)
+        if i is None:
+            raise ValueError(f"Unknown {label}: {name}")
+        mask |= 1 << i
+    return mask
+
+
+@lru_cache(maxsize=1024)
+def mask_ids(mask: int) -> tuple:
+    """
+    The catalog indices set in mask, in ascending order; cached because a
+    session keeps rolling with the same selection.
+    """
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return tuple(ids)
+
+
+def random_bit(mask: int, rng=random) -> int:
+    """
+    A uniformly chosen set bit of mask, as a catalog index. Draws the same
+    number as rng.choice over the matching catalog-ordered list would.
+    """
+    return rng.choice(mask_ids(mask))
+
+
+SELECTION_INDEX = {"mode": MODE_ID, "map": MAP_ID, "hero": HERO_ID}
+
+
+@lru_cache(maxsize=1024)
+def _cached_mask(names: tuple, label: str) -> int:
+    return mask_of(names, SELECTION_INDEX[label], label)
+
+
+def selection_mask(names, label: str) -> int:
+    """
+    mask_of for a "mode", "map" or "hero" selection, cached like mask_ids.
+    """
+    try:
+        return _cached_mask(tuple(names), label)
+    except TypeError:
+        # Map dicts aren't hashable
+        return mask_of(names, SELECTION_INDEX[label], label)
+
+
+ALL_MODES = (1 << len(modes)) - 1
+ALL_MAPS = (1 << len(maps)) - 1
+ALL_HEROES = (1 << len(heroes)) - 1
+# Maps with water, which is also where Admiral Brickell is legal
+WATER_MAPS = mask_of([m["name"] for m in maps if m["water"]], MAP_ID)
+
+
+class ModeRules(NamedTuple):
+    towers: tuple              # valid towers, in tower_order
+    heroes: tuple              # valid heroes, in catalog order
+    banned_heroes: frozenset   # heroes that are not allowed
+    hero_mask: int             # valid heroes as a bitmask
+
+
+def build_rules() -> dict:
+    """
+    Resolve the rules for every (mode, has_water) pair up front.
+    """
+    rules = {}
+    for mode in modes:
+        for has_water in (False, True):
+            banned_towers = MODE_BANNED_TOWERS.get(mode, frozenset())
+            banned_heroes = MODE_BANNED_HEROES.get(mode, frozenset())
+            if not has_water:
+                banned_towers |= WATER_TOWERS
+                banned_heroes |= WATER_HEROES
+            towers = MODE_TOWER_CLASSES.get(mode, all_towers)
+            legal_heroes = tuple(h for h in heroes if h not in banned_heroes)
+            rules[mode, has_water] = ModeRules(
+                towers=tuple(t for t in towers if t not in banned_towers),
+                heroes=legal_heroes,
+                banned_heroes=banned_heroes,
+                hero_mask=mask_of(legal_heroes, HERO_ID),
+            )
+    return rules
+
+
+RULES = build_rules()
+
+
+@lru_cache(maxsize=256)
+def tower_multiset(pool: tuple, max_duplicates: int) -> tuple:
+    """
+    pool with every tower repeated max_duplicates times.
+    """
+    if max_duplicates == 1:
+        return pool
+    return tuple(t for t in pool for _ in range(max_duplicates))
+
+
+def sample_towers(pool: tuple, tower_count: int, max_duplicates=1, rng=random) -> list:
+    """
+    Draw tower_count towers from pool with each tower used at most
+    max_duplicates times, i.e. a sample without replacement from the multiset
+    holding max_duplicates copies of every tower.
+
+    random.sample over the cached multiset takes O(tower_count) time whatever
+    the settings; raises ValueError if the request can't be met.
+    """
+    if tower_count > len(pool) * max_duplicates:
+        raise ValueError(
+            f"Can't pick {tower_count} towers from {len(pool)} available "
+            f"with at most {max_duplicates} of each. "
+            "Try fewer towers or allow more duplicates."
+        )
+    return rng.sample(tower_multiset(pool, max_duplicates), tower_count)
+
+
+# -------------------------
+# RANDOMIZE FUNCTION
+# -------------------------
+def randomize_btd6_setup(
+    selected_modes=None,
+    selected_maps=None,
+    selected_heroes=None,
+    tower_count=5,
+    allow_duplicates=False,
+    max_duplicates=3,
+    seed=None
+):
+    """
+    Roll a (mode, map, hero, towers) setup. Pass a seed to make the roll
+    reproducible; without one it uses the shared `random` module.
+    Raises ValueError for unknown names or a selection that can't be met.
+    """
+    # Use provided selections or fall back to defaults
+    return randomize_from_masks(
+        selection_mask(selected_modes, "mode") if selected_modes else ALL_MODES,
+        selection_mask(selected_maps, "map") if selected_maps else ALL_MAPS,
+        selection_mask(selected_heroes, "hero") if selected_heroes else ALL_HEROES,
+        tower_count, allow_duplicates, max_duplicates, seed,
+    )
+
+
+def randomize_from_masks(
+    mode_mask=ALL_MODES,
+    map_mask=ALL_MAPS,
+    hero_mask=ALL_HEROES,
+    tower_count=5,
+    allow_duplicates=False,
+    max_duplicates=3,
+    seed=None,
+    weights=None,
+    cooldown=None
+):
+    """
+    randomize_btd6_setup for selections given as bitmasks over modes, maps
+    and heroes. weights (a weights.RollWeights) makes the mode, map and hero
+    draws weighted instead of uniform, and cooldown (a cooldown.Cooldown)
+    keeps out the maps, heroes and tower sets of recent rolls.
+    """
+    rng = random if seed is None else random.Random(seed)
+    if not mode_mask & ALL_MODES or not map_mask & ALL_MAPS:
+        raise ValueError("Select at least one mode and one map.")
+
+    # 🎯 Randomly pick a mode
+    pick = random_bit if weights is None else weights.mode.draw
+    mode = modes[pick(mode_mask & ALL_MODES, rng)]
+
+    # 🎯 Randomly pick a map
+    map_mask &= ALL_MAPS
+    if cooldown is not None:
+        map_mask = cooldown.allowed_maps(map_mask)
+    pick = random_bit if weights is None else weights.map.draw
+    map_choice = maps[pick(map_mask, rng)]
+
+    has_water = map_choice["water"]
+    rules = RULES[mode, has_water]
+
+    # 🎯 Pick a valid hero (no Admiral Brickell if no water, no Benjamin in Deflation/CHIMPS)
+    valid_heroes = hero_mask & rules.hero_mask
+    if not valid_heroes:
+        raise ValueError(f"None of the selected heroes can be played on {map_choice['name']} in {mode}.")
+    if cooldown is not None:
+        valid_heroes = cooldown.allowed_heroes(valid_heroes)
+    pick = random_bit if weights is None else weights.hero.draw
+    hero = heroes[pick(valid_heroes, rng)]
+
+    # 🎯 Randomly pick towers from the mode/water pool, sorted by predefined order
+    max_duplicates = max_duplicates if allow_duplicates else 1
+    tower_selection = sample_towers(rules.towers, tower_count, max_duplicates, rng)
+    tower_selection.sort(key=TOWER_RANK.__getitem__)
+    if cooldown is not None:
+        for _ in range(cooldown.MAX_TOWER_REDRAWS):
+            if not cooldown.repeats_towers(tower_selection):
+                break
+            tower_selection = sample_towers(rules.towers, tower_count, max_duplicates, rng)
+            tower_selection.sort(key=TOWER_RANK.__getitem__)
+
+    return mode, map_choice, hero, tower_selection
@@ -0,0 +1,308 @@
+"""
+Monte Carlo check of the randomizer's output distribution.
+
+    python -m btd6_randomizer --check-fairness [ROLLS]    # exit 1 on a failed test
+
+For each constraint set in CONSTRAINT_SETS, the exact distribution the rules
+imply is worked out by enumerating every (mode, map) pair. It is compared with
+tallies of:
+
+- millions of rolls from batch.generate_setups, counted with np.bincount
+- a smaller sample from the scalar engine (randomize_from_masks)
+
+Each test is a chi-square goodness-of-fit and a KS statistic over the
+categories. Tests run on mode, map and hero counts, on tower occurrences and,
+when duplicates are allowed, on how many copies of each tower a roll holds.
+
+A failed test means an engine doesn't follow its own rules. Separately,
+"uneven by design" lists the items the rules themselves make more or less
+likely than an even share. Examples: Admiral Brickell only on water maps,
+or water towers on fewer maps.
+
+Statistics are pure Python (regularized incomplete gamma for the chi-square
+p-value, the Kolmogorov series for KS), so SciPy isn't needed. The tower
+occurrence test treats the towers of one roll as independent draws. They are
+drawn without replacement, so the test is conservative there.
+"""
+import math
+import random
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .batch import BANNED_HERO_IDS, ID_DTYPE, MAP_WATER, TOWER_POOLS, Constraints, SetupBatch, generate_setups
+from .data import modes, maps, heroes, tower_order
+from .engine import HERO_ID, MAP_ID, MODE_ID, TOWER_RANK, mask_ids, mask_of, randomize_from_masks
+
+CONSTRAINT_SETS = {
+    "defaults": Constraints(),
+    "CHIMPS/Deflation": Constraints(modes=("CHIMPS", "Deflation")),
+    "dry maps, 4 towers": Constraints(maps=tuple(m["name"] for m in maps if not m["water"]), tower_count=4),
+    "Magic Only, 10 towers, 3 dups": Constraints(modes=("Magic Only",), tower_count=10,
+                                                 allow_duplicates=True, max_duplicates=3),
+    "8 towers, 2 dups": Constraints(tower_count=8, allow_duplicates=True, max_duplicates=2),
+}
+
+BATCH_ROLLS = 1 << 22
+ENGINE_ROLLS = 50_000
+CHUNK = 1 << 20
+# Per-test significance level; low because every run does dozens of tests
+ALPHA = 1e-4
+# Expected odds this far from an even share are listed as uneven by design
+DESIGN_TOLERANCE = 0.10
+
+CATEGORIES = {"mode": modes, "map": [m["name"] for m in maps], "hero": heroes, "tower": tower_order}
+
+
+# --- statistics ---
+def _gamma_q(a: float, x: float) -> float:
+    """
+    Regularized upper incomplete gamma Q(a, x) (Numerical Recipes gser/gcf).
+    """
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        n = a
+        for _ in range(10000):
+            n += 1
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def chi_square(observed, expected):
+    """
+    Pearson's chi-square of observed counts against expected counts, over the
+    categories with a non-zero expectation. Returns (statistic, dof, p-value);
+    observations in a category expected to be empty give p = 0.
+    """
+    observed = np.asarray(observed, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    possible = expected > 0
+    if observed[~possible].any():
+        return math.inf, int(possible.sum()) - 1, 0.0
+    o, e = observed[possible], expected[possible]
+    stat = float(((o - e) ** 2 / e).sum())
+    dof = len(e) - 1
+    if dof < 1:
+        return stat, dof, 1.0
+    return stat, dof, _gamma_q(dof / 2, stat / 2)
+
+
+def kolmogorov_smirnov(observed, probs):
+    """
+    KS distance between the empirical and expected CDF over the category
+    order, and its asymptotic p-value (conservative for discrete data).
+    """
+    observed = np.asarray(observed, dtype=float)
+    n = observed.sum()
+    d = float(np.abs(np.cumsum(observed) / n - np.cumsum(probs)).max()) if n else 0.0
+    lam = (math.sqrt(n) + 0.12 + 0.11 / math.sqrt(n)) * d if n else 0.0
+    if lam < 0.2:
+        return d, 1.0
+    p = 2 * sum((-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return d, min(1.0, max(0.0, p))
+
+
+# --- expected distribution ---
+def _ids(names, index, label, size):
+    return mask_ids(mask_of(names, index, label)) if names else tuple(range(size))
+
+
+def expected_distribution(constraints=None) -> dict:
+    """
+    Exact per-roll probabilities for a constraint set: mode, map and hero
+    (summing to 1), the mean number of times each tower appears, and with
+    duplicates the distribution of copies per tower of a roll's pool.
+    """
+    c = constraints or Constraints()
+    mode_ids = _ids(c.modes, MODE_ID, "mode", len(modes))
+    map_ids = _ids(c.maps, MAP_ID, "map", len(maps))
+    hero_ids = _ids(c.heroes, HERO_ID, "hero", len(heroes))
+    copies = c.max_duplicates if c.allow_duplicates else 1
+    k = c.tower_count
+
+    dist = {
+        "mode": np.zeros(len(modes)),
+        "map": np.zeros(len(maps)),
+        "hero": np.zeros(len(heroes)),
+        "tower": np.zeros(len(tower_order)),
+        "copies": np.zeros(copies + 1),
+    }
+    p = 1 / (len(mode_ids) * len(map_ids))
+    for mode in mode_ids:
+        for map_id in map_ids:
+            key = (mode, bool(MAP_WATER[map_id]))
+            dist["mode"][mode] += p
+            dist["map"][map_id] += p
+            pool = [h for h in hero_ids if h not in BANNED_HERO_IDS[key]]
+            if not pool:
+                raise ValueError(f"None of the selected heroes can be played in {modes[mode]} on {maps[map_id]['name']}.")
+            dist["hero"][pool] += p / len(pool)
+            towers = TOWER_POOLS[key]
+            size = len(towers) * copies
+            if k > size:
+                raise ValueError(f"Can't pick {k} towers in {modes[mode]} on {maps[map_id]['name']}.")
+            dist["tower"][towers] += p * k / len(towers)
+            # Copies of one tower in a draw of k from the multiset: hypergeometric
+            for j in range(min(copies, k) + 1):
+                dist["copies"][j] += p * len(towers) * math.comb(copies, j) * math.comb(size - copies, k - j) / math.comb(size, k)
+    return dist
+
+
+# --- tallies ---
+POOL_SIZE = np.zeros(len(modes) * 2, dtype=np.int64)
+for (_mode, _water), _pool in TOWER_POOLS.items():
+    POOL_SIZE[_mode * 2 + _water] = len(_pool)
+
+
+def tally(batch: SetupBatch, copies: int) -> dict:
+    """
+    Category counts for a batch, in the shape expected_distribution returns.
+    """
+    n, k = batch.towers.shape
+    counts = {
+        "mode": np.bincount(batch.mode, minlength=len(modes)),
+        "map": np.bincount(batch.map, minlength=len(maps)),
+        "hero": np.bincount(batch.hero, minlength=len(heroes)),
+        "tower": np.bincount(batch.towers.ravel(), minlength=len(tower_order)),
+        "copies": np.zeros(copies + 1, dtype=np.int64),
+    }
+    if copies > 1 and n:
+        # Rows are sorted, so each run of equal towers is one tower's copies
+        starts = np.ones((n, k), dtype=bool)
+        starts[:, 1:] = batch.towers[:, 1:] != batch.towers[:, :-1]
+        runs = np.flatnonzero(starts.ravel())
+        counts["copies"] = np.bincount(np.diff(np.append(runs, n * k)), minlength=copies + 1)
+        pool_sizes = POOL_SIZE[batch.mode.astype(np.int64) * 2 + MAP_WATER[batch.map]]
+        counts["copies"][0] = pool_sizes.sum() - len(runs)
+    return counts
+
+
+def _add(total, counts):
+    if total is None:
+        return {name: c.astype(np.int64) for name, c in counts.items()}
+    for name, c in counts.items():
+        total[name] += c
+    return total
+
+
+def batch_counts(constraints, rolls: int, seed=0) -> dict:
+    c = constraints
+    copies = c.max_duplicates if c.allow_duplicates else 1
+    chunks = [min(CHUNK, rolls - start) for start in range(0, rolls, CHUNK)]
+    total = None
+    for size, seed_seq in zip(chunks, np.random.SeedSequence(seed).spawn(len(chunks))):
+        total = _add(total, tally(generate_setups(size, c, seed_seq), copies))
+    return total
+
+
+def engine_counts(constraints, rolls: int, seed=0) -> dict:
+    c = constraints
+    rng = random.Random(seed)
+    masks = (
+        mask_of(c.modes, MODE_ID, "mode") if c.modes else (1 << len(modes)) - 1,
+        mask_of(c.maps, MAP_ID, "map") if c.maps else (1 << len(maps)) - 1,
+        mask_of(c.heroes, HERO_ID, "hero") if c.heroes else (1 << len(heroes)) - 1,
+    )
+    mode = np.empty(rolls, dtype=ID_DTYPE)
+    map_ = np.empty(rolls, dtype=ID_DTYPE)
+    hero = np.empty(rolls, dtype=ID_DTYPE)
+    towers = np.empty((rolls, c.tower_count), dtype=ID_DTYPE)
+    for i in range(rolls):
+        m, map_choice, h, ts = randomize_from_masks(
+            *masks, c.tower_count, c.allow_duplicates, c.max_duplicates, rng.getrandbits(64))
+        mode[i], map_[i], hero[i] = MODE_ID[m], MAP_ID[map_choice["name"]], HERO_ID[h]
+        towers[i] = [TOWER_RANK[t] for t in ts]
+    return tally(SetupBatch(mode, map_, hero, towers), c.max_duplicates if c.allow_duplicates else 1)
+
+
+# --- report ---
+class TestResult(NamedTuple):
+    source: str
+    name: str
+    n: int
+    chi2: float
+    dof: int
+    p: float
+    ks: float
+    ks_p: float
+
+    @property
+    def ok(self) -> bool:
+        return self.p >= ALPHA and self.ks_p >= ALPHA
+
+
+def run_tests(source: str, counts: dict, dist: dict, rolls: int) -> list:
+    results = []
+    for name, probs in dist.items():
+        if name == "copies" and len(probs) <= 2:
+            continue
+        total = probs.sum()
+        n = int(counts[name].sum())
+        chi2, dof, p = chi_square(counts[name], probs / total * n)
+        ks, ks_p = kolmogorov_smirnov(counts[name], probs / total)
+        results.append(TestResult(source, name, n, chi2, dof, p, ks, ks_p))
+    return results
+
+
+def uneven_by_design(dist: dict) -> list:
+    """
+    (category, item, odds relative to an even share) for items whose expected
+    odds differ from an even split among the items that can come up.
+    """
+    found = []
+    for name, labels in CATEGORIES.items():
+        probs = dist[name]
+        possible = probs > 0
+        even = probs[possible].mean()
+        for i in np.flatnonzero(possible):
+            ratio = probs[i] / even
+            if abs(ratio - 1) > DESIGN_TOLERANCE:
+                found.append((name, labels[i], ratio))
+    return found
+
+
+def check(batch_rolls=BATCH_ROLLS, engine_rolls=ENGINE_ROLLS, seed=0) -> int:
+    """
+    Run every constraint set and print the results; returns an exit status.
+    """
+    failed = 0
+    start = time.perf_counter()
+    for label, constraints in CONSTRAINT_SETS.items():
+        dist = expected_distribution(constraints)
+        print(f"== {label}")
+        results = run_tests("batch", batch_counts(constraints, batch_rolls, seed), dist, batch_rolls)
+        results += run_tests("engine", engine_counts(constraints, engine_rolls, seed), dist, engine_rolls)
+        for r in results:
+            failed += not r.ok
+            print(f"  {r.source:<6} {r.name:<6} n={r.n:<10} chi2={r.chi2:>9.1f} dof={r.dof:<3} "
+                  f"p={r.p:<8.3g} KS={r.ks:.2e} p={r.ks_p:<8.3g} {'ok' if r.ok else 'FAIL'}")
+        uneven = uneven_by_design(dist)
+        if uneven:
+            print("  uneven by design: " + ", ".join(f"{item} {ratio:.2f}x" for _, item, ratio in uneven))
+    print(f"{failed} failed test(s) in {time.perf_counter() - start:.1f} s")
+    return 1 if failed else 0
@@ -0,0 +1,670 @@
+"""
+Image download helpers for the BTD6 randomizer.
+
+These live outside the Streamlit script on purpose: the script is re-executed on
+every interaction, while an imported module is loaded once per server process.
+That lets the pooled HTTP session and the background prefetch be shared by all
+reruns and sessions.
+
+requests and PIL are imported on first use, so importing this module (for
+IMG_DIR, or from the headless CLI) stays cheap.
+
+Set BTD6_ASSET_BUNDLE to a bundle built by `python -m btd6_randomizer
+--build-bundle` to serve images without the network, and BTD6_OFFLINE=1 to
+never attempt a download.
+
+Downloads remember their ETag/Last-Modified. Once they are older than
+BTD6_REVALIDATE_HOURS (default 24, 0 to never), a low-priority background
+thread re-checks them with conditional requests, so an image the wiki hasn't
+changed costs a 304 and no body.
+"""
+import base64
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
+
+from . import metrics
+from .blobcache import BlobCache
+from .bundle import AssetBundle, BundleError, write_bundle
+from .cache import LRUCache
+from .data import hero_images, maps_images, mode_images, tower_images
+
+IMG_DIR = "images"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Referer": "https://bloons.fandom.com/"
+}
+
+PREFETCH_WORKERS = 8
+REVALIDATE_WORKERS = 2
+DOWNLOAD_TIMEOUT = 15
+
+# Width (px) each kind of image is shown at in the results
+DISPLAY_WIDTHS = {"map": 300, "mode": 150, "hero": 200, "tower": 100}
+
+# Display widths we keep resized variants for. Variants are rendered at
+# THUMBNAIL_SCALE pixels per display pixel (same factor the wiki CDN is asked for),
+# from one source download at the largest width.
+THUMBNAIL_WIDTHS = (100, 150, 200, 300)
+THUMBNAIL_SCALE = 1.5
+SOURCE_WIDTH = max(THUMBNAIL_WIDTHS)
+
+# URL prefix Streamlit serves <app dir>/static/ under when server.enableStaticServing is on
+STATIC_URL_PREFIX = "app/static"
+
+# Memory budget for encoded images, shared by every session in the process
+ASSET_CACHE_BYTES = int(float(os.environ.get("BTD6_ASSET_CACHE_MB", "64")) * 1024 * 1024)
+
+# Prebuilt offline bundle (see bundle.py), and whether to skip the network entirely
+BUNDLE_PATH = os.environ.get("BTD6_ASSET_BUNDLE", "assets.bundle")
+OFFLINE = os.environ.get("BTD6_OFFLINE", "") not in ("", "0")
+
+# Age (seconds) after which a cached download is checked against the server again
+REVALIDATE_AFTER = float(os.environ.get("BTD6_REVALIDATE_HOURS", "24")) * 3600
+
+
+# --- UTILITY FUNCTIONS ---
+def sanitize_filename(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+def scale_wiki_image(url: str, display_width: int) -> str:
+    scale_width = int(display_width * 1.5)
+
+    url = re.sub(r"/scale-to-width-down/\d+", "", url)
+
+    parts = url.split("?")
+    scaled_url = parts[0].rstrip("/") + f"/scale-to-width-down/{scale_width}"
+    if len(parts) > 1:
+        scaled_url += "?" + parts[1]
+
+    return scaled_url
+
+def get_ext_from_url(url: str) -> str:
+    path = urllib.parse.urlparse(url).path
+    ext = os.path.splitext(path)[1]
+    if ext.lower() in (".png", ".jpg", ".jpeg", ".gif", ".webp"):
+        return ext
+    return ".png"
+
+# Downloads and thumbnails, stored by content hash under IMG_DIR
+image_cache = BlobCache(IMG_DIR)
+
+
+# --- HTTP SESSION ---
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the process-wide pooled requests.Session, creating it on first use.
+    Transient failures (connection errors, 429, 5xx) are retried with backoff.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",),
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PREFETCH_WORKERS, max_retries=retry)
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def _counted(chunks, counter: str):
+    for chunk in chunks:
+        metrics.inc(counter, len(chunk))
+        yield chunk
+
+
+def _store_download(key: str, url: str, resp) -> str:
+    """
+    Stream a 200 response into the image cache, with the validators needed to
+    revalidate it later.
+    """
+    # Content-Length counts the encoded body; only compare it when the body isn't compressed
+    expected = None
+    if "Content-Length" in resp.headers and "Content-Encoding" not in resp.headers:
+        expected = int(resp.headers["Content-Length"])
+    # The blob only becomes visible once it is complete and the right size
+    return image_cache.put_stream(
+        key, _counted(resp.iter_content(65536), "net.download.bytes"), get_ext_from_url(url), expected,
+        etag=resp.headers.get("ETag"),
+        last_modified=resp.headers.get("Last-Modified"),
+        checked=time.time(),
+    )
+
+
+def ensure_image(name: str, url: str, force_download=False):
+    """
+    Ensure the image is available locally.
+    Returns a local path if possible; otherwise returns the URL.
+    """
+    if not url:
+        return None
+
+    key = image_cache.key(name, url)
+    if not force_download:
+        path = image_cache.path(key)
+        if path:
+            metrics.inc("image.download.hit")
+            return path
+    if OFFLINE:
+        return url
+
+    metrics.inc("image.download.miss")
+    try:
+        with metrics.timer("image.download"):
+            resp = get_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+            with resp:
+                if resp.status_code != 200:
+                    metrics.inc("image.download.failed")
+                    return url
+                return _store_download(key, url, resp)
+    except Exception:
+        metrics.inc("image.download.failed")
+        return url
+
+
+def revalidate_image(name: str, url: str, max_age=0.0) -> str:
+    status = _revalidate_image(name, url, max_age)
+    metrics.inc(f"image.revalidate.{status}")
+    return status
+
+
+def _revalidate_image(name: str, url: str, max_age=0.0) -> str:
+    """
+    Check a cached download against the server with a conditional GET.
+    Returns "fresh" (checked less than max_age seconds ago), "unchanged"
+    (304, or the same bytes again), "updated", "uncached" or "failed".
+    """
+    key = image_cache.key(name, url)
+    entry = image_cache.lookup(key)
+    if entry is None:
+        return "uncached"
+    if time.time() - entry.get("checked", 0) < max_age:
+        return "fresh"
+
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        with metrics.timer("image.revalidate"):
+            resp = get_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        with resp:
+            if resp.status_code == 304:
+                # A 304 may carry newer validators; keep the ones we have otherwise
+                validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+                image_cache.touch(key, checked=time.time(),
+                                  **{k: v for k, v in validators.items() if v})
+                return "unchanged"
+            if resp.status_code != 200:
+                return "failed"
+            _store_download(key, url, resp)
+    except Exception:
+        return "failed"
+
+    if image_cache.lookup(key)["sha256"] == entry["sha256"]:
+        return "unchanged"
+    # Thumbnails are keyed by the download's hash, so only the encoded copies are stale
+    asset_store.forget(name)
+    return "updated"
+
+
+# --- THUMBNAILS ---
+@lru_cache(maxsize=None)
+def thumbnail_format() -> str:
+    """
+    WEBP, or PNG if Pillow was built without WebP support.
+    """
+    from PIL import features
+    return "WEBP" if features.check("webp") else "PNG"
+
+def variant_width(display_width: int) -> int:
+    """
+    The smallest thumbnail width that covers display_width.
+    """
+    for width in THUMBNAIL_WIDTHS:
+        if width >= display_width:
+            return width
+    return THUMBNAIL_WIDTHS[-1]
+
+def ensure_thumbnail(name: str, src_path: str, width: int, force=False) -> str:
+    """
+    Ensure the resized variant of a downloaded image exists.
+    Returns its path, or src_path if the image could not be resized.
+    """
+    from PIL import Image
+
+    # Downloads are content-addressed, so a new source file means a new key
+    key = image_cache.key(name, os.path.basename(src_path), width)
+    path = image_cache.path(key)
+    if path and not force:
+        metrics.inc("image.thumbnail.hit")
+        return path
+
+    metrics.inc("image.thumbnail.miss")
+    try:
+        buffered = BytesIO()
+        with metrics.timer("image.thumbnail"), Image.open(src_path) as img:
+            img = img.convert("RGBA")
+            img.thumbnail((int(width * THUMBNAIL_SCALE), img.height), Image.LANCZOS)
+            if thumbnail_format() == "WEBP":
+                img.save(buffered, format="WEBP", quality=85, method=6)
+            else:
+                img.save(buffered, format="PNG", optimize=True)
+        ext = ".webp" if thumbnail_format() == "WEBP" else ".png"
+        return image_cache.put_bytes(key, buffered.getvalue(), ext)
+    except Exception as e:
+        print("Error resizing image:", e)
+        return src_path
+
+
+# --- ENCODED ASSETS ---
+# Formats browsers display natively; these are inlined as-is instead of re-encoded
+MAGIC_MIME_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+def sniff_mime(data: bytes):
+    for magic, mime in MAGIC_MIME_TYPES:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def img_to_base64(path_or_url):
+    """
+    Convert a local file or URL to a base64 string for HTML embedding.
+    """
+    from PIL import Image
+
+    try:
+        if path_or_url.startswith("http"):
+            with metrics.timer("image.download"):
+                response = get_session().get(path_or_url, timeout=DOWNLOAD_TIMEOUT)
+            metrics.inc("net.download.bytes", len(response.content))
+            img = Image.open(BytesIO(response.content))
+        else:
+            img = Image.open(path_or_url)
+        buffered = BytesIO()
+        with metrics.timer("image.pil_encode"):
+            img.save(buffered, format="PNG")
+        img_str = base64.b64encode(buffered.getvalue()).decode()
+        return f"data:image/png;base64,{img_str}"
+    except Exception as e:
+        print("Error loading image:", e)
+        return None
+
+
+def bytes_to_data_uri(data, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+
+def file_to_data_uri(path: str):
+    """
+    Build the data: URI for a local image, reusing the file bytes when the
+    browser can show them directly and only going through PIL otherwise.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    mime = sniff_mime(data)
+    if mime is None:
+        return img_to_base64(path)
+    return bytes_to_data_uri(data, mime)
+
+
+# --- STATIC FILES ---
+MIME_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+def publish_static(path: str, static_dir: str, name: str) -> str:
+    """
+    Copy a file into static_dir/img under a content-hashed name and return the
+    URL the browser loads it from.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return publish_static_bytes(data, os.path.splitext(path)[1], static_dir, name)
+
+
+def publish_static_bytes(data, ext: str, static_dir: str, name: str, sha256=None) -> str:
+    """
+    publish_static for bytes already in memory; pass sha256 if it is known.
+    """
+    digest = (sha256 or hashlib.sha256(data).hexdigest())[:16]
+    filename = f"{sanitize_filename(name)}.{digest}{ext}"
+    dest = os.path.join(static_dir, "img", filename)
+    if not os.path.exists(dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, dest)
+    # The name already changes with the content; ?v= is what makes tornado's
+    # static handler send a far-future Cache-Control/Expires for it.
+    return f"{STATIC_URL_PREFIX}/img/{filename}?v={digest}"
+
+
+class AssetStore:
+    """
+    The final <img> src for each asset, using the thumbnail variant that fits
+    the display width. Encoded once and then served from a process-wide LRU
+    cache capped at max_bytes.
+
+    With static_dir set, the src is a URL to a content-hashed copy of the file
+    in Streamlit's static folder instead of an inline data: URI (or still a
+    data: URI if the static folder can't be written to). Assets found
+    in the offline bundle (use_bundle) never touch the image cache or network.
+    """
+    def __init__(self, max_bytes=ASSET_CACHE_BYTES, static_dir=None):
+        self.cache = LRUCache(max_bytes)
+        self.static_dir = static_dir
+        self.bundle = None
+        self._static_warned = False
+
+    def use_bundle(self, path=BUNDLE_PATH) -> bool:
+        """
+        Serve assets from the bundle at path when it exists; returns whether it does.
+        """
+        if self.bundle is not None and self.bundle.path == path:
+            return True
+        try:
+            bundle = AssetBundle(path)
+        except FileNotFoundError:
+            return False
+        except BundleError as e:
+            print("Ignoring asset bundle:", e)
+            return False
+        self.bundle = bundle
+        self.cache.clear()
+        return True
+
+    def forget(self, name: str):
+        """
+        Drop the encoded variants of name, so the next get() encodes them again.
+        """
+        for width in THUMBNAIL_WIDTHS:
+            self.cache.pop((name, width))
+
+    def serve_static(self, static_dir):
+        """
+        Switch between static URLs (static_dir) and inline data: URIs (None).
+        """
+        if static_dir != self.static_dir:
+            self.static_dir = static_dir
+            self.cache.clear()
+
+    def get(self, name: str, url: str, display_width: int):
+        """
+        Return the src for the image: a static URL or data: URI, or the remote
+        URL if the image could not be downloaded (failures are not cached).
+        """
+        if not url:
+            return None
+        width = variant_width(display_width)
+        key = (name, width)
+        uri = self.cache.get(key)
+        if uri is not None:
+            metrics.inc("asset.hit")
+            return uri
+
+        packed = self.bundle.get(name, width) if self.bundle else None
+        if packed:
+            data, mime, sha256 = packed
+            uri = self._publish(data, MIME_EXTENSIONS[mime], f"{name}_{width}", sha256) or bytes_to_data_uri(data, mime)
+            metrics.inc("asset.bundle")
+            self.cache.put(key, uri)
+            return uri
+
+        metrics.inc("asset.miss")
+        with metrics.timer("asset.build"):
+            source_url = scale_wiki_image(url, SOURCE_WIDTH)
+            src = ensure_image(name, source_url)
+            try:
+                uri = self._encode(name, src, width)
+            except OSError:
+                # The manifest is trusted without a stat; if a blob went missing
+                # behind its back, download it again
+                src = ensure_image(name, source_url, force_download=True)
+                try:
+                    uri = self._encode(name, src, width, force=True)
+                except OSError as e:
+                    print("Error reading image:", e)
+                    uri = None
+        if uri is None:
+            metrics.inc("asset.remote")
+            return scale_wiki_image(url, display_width)
+        self.cache.put(key, uri)
+        return uri
+
+    def _encode(self, name: str, src, width: int, force=False):
+        """
+        The src for a downloaded file, or None if it isn't available locally.
+        Raises OSError only if the file itself can't be read.
+        """
+        if not src or src.startswith("http"):
+            return None
+        thumb = ensure_thumbnail(name, src, width, force)
+        with open(thumb, "rb") as f:
+            data = f.read()
+        uri = self._publish(data, os.path.splitext(thumb)[1], f"{name}_{width}")
+        if uri:
+            return uri
+        mime = sniff_mime(data)
+        return bytes_to_data_uri(data, mime) if mime else img_to_base64(thumb)
+
+    def _publish(self, data, ext: str, name: str, sha256=None):
+        """
+        The static URL for data, or None when not serving static files or the
+        static folder can't be written to (the caller inlines it instead).
+        """
+        if not self.static_dir:
+            return None
+        try:
+            return publish_static_bytes(data, ext, self.static_dir, name, sha256)
+        except OSError as e:
+            metrics.inc("asset.static_failed")
+            if not self._static_warned:
+                self._static_warned = True
+                print("Can't write static images, inlining them instead:", e)
+            return None
+
+    def __len__(self):
+        return len(self.cache)
+
+    @property
+    def nbytes(self) -> int:
+        return self.cache.nbytes
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+asset_store = AssetStore()
+
+
+def image_jobs():
+    """
+    Every (name, url, display width) the results can show, for the prefetch
+    and the offline bundle.
+    """
+    for images, kind in ((maps_images, "map"), (mode_images, "mode"),
+                         (hero_images, "hero"), (tower_images, "tower")):
+        for name, url in images.items():
+            yield name, url, DISPLAY_WIDTHS[kind]
+
+
+def build_bundle(path=BUNDLE_PATH, jobs=None):
+    """
+    Pack the display-ready variant of every image into an offline bundle at
+    path, downloading whatever the image cache doesn't have yet.
+    Returns (number packed, names that could not be fetched).
+    """
+    from PIL import Image
+
+    assets, missing, seen = [], [], set()
+    for name, url, display_width in image_jobs() if jobs is None else jobs:
+        width = variant_width(display_width)
+        if (name, width) in seen:
+            continue
+        seen.add((name, width))
+        src = ensure_image(name, scale_wiki_image(url, SOURCE_WIDTH))
+        if not src or src.startswith("http"):
+            missing.append(name)
+            continue
+        with open(ensure_thumbnail(name, src, width), "rb") as f:
+            data = f.read()
+        mime = sniff_mime(data)
+        if mime is None:
+            buffered = BytesIO()
+            Image.open(BytesIO(data)).save(buffered, format="PNG")
+            data, mime = buffered.getvalue(), "image/png"
+        assets.append((name, width, data, mime))
+    return write_bundle(path, assets), missing
+
+
+# --- PREFETCH ---
+class PrefetchProgress:
+    """
+    Progress of a prefetch run; updated from worker threads, read by the UI.
+    """
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = []
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ok: bool):
+        with self._lock:
+            self.done += 1
+            if not ok:
+                self.failed.append(name)
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 1.0
+
+
+def prefetch_images(jobs, max_workers=PREFETCH_WORKERS, on_progress=None, progress=None):
+    """
+    Download, resize and encode every (name, url, display_width) in jobs
+    through a bounded thread pool, filling asset_store.
+    on_progress(done, total) is called after each image finishes.
+    """
+    jobs = list(jobs)
+    if progress is None:
+        progress = PrefetchProgress(len(jobs))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="btd6-prefetch") as pool:
+            futures = {pool.submit(asset_store.get, *job): job[0] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    src = future.result()
+                except Exception as e:
+                    print(f"Error prefetching {futures[future]}:", e)
+                    src = None
+                progress.record(futures[future], ok=bool(src) and not src.startswith("http"))
+                if on_progress:
+                    on_progress(progress.done, progress.total)
+    finally:
+        progress.finished.set()
+    return progress
+
+
+_prefetch = None
+_prefetch_lock = threading.Lock()
+
+def start_prefetch(jobs, max_workers=PREFETCH_WORKERS) -> PrefetchProgress:
+    """
+    Start warming asset_store in a background thread, once per process.
+    Later calls return the progress of the run that is already going.
+    """
+    global _prefetch
+    with _prefetch_lock:
+        if _prefetch is None:
+            jobs = list(jobs)
+            _prefetch = PrefetchProgress(len(jobs))
+            threading.Thread(
+                target=prefetch_images,
+                kwargs={"jobs": jobs, "max_workers": max_workers, "progress": _prefetch},
+                name="btd6-prefetch",
+                daemon=True,
+            ).start()
+    return _prefetch
+
+
+# --- REVALIDATION ---
+def _lower_priority():
+    # Linux schedules threads on their own, so this only slows down the calling thread
+    if sys.platform.startswith("linux"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except OSError:
+            pass
+
+
+def revalidate_images(jobs, max_age=0.0, max_workers=REVALIDATE_WORKERS) -> dict:
+    """
+    Revalidate the cached download behind every (name, url, display_width) in
+    jobs; returns how many ended up in each revalidate_image() state.
+    """
+    sources = {(name, scale_wiki_image(url, SOURCE_WIDTH)) for name, url, _ in jobs if url}
+    counts = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="btd6-revalidate",
+                            initializer=_lower_priority) as pool:
+        for status in pool.map(lambda source: revalidate_image(*source, max_age=max_age), sources):
+            counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+_revalidation = None
+_revalidation_lock = threading.Lock()
+
+def start_revalidation(jobs, max_age=REVALIDATE_AFTER):
+    """
+    Revalidate downloads older than max_age in a low-priority background
+    thread, once per process and after the prefetch has finished.
+    """
+    global _revalidation
+    if OFFLINE or max_age <= 0:
+        return
+    with _revalidation_lock:
+        if _revalidation is None:
+            jobs = list(jobs)
+
+            def run():
+                _lower_priority()
+                if _prefetch is not None:
+                    _prefetch.finished.wait()
+                revalidate_images(jobs, max_age)
+
+            _revalidation = threading.Thread(target=run, name="btd6-revalidate", daemon=True)
+            _revalidation.start()
@@ -0,0 +1,135 @@
+"""
+Process-wide counters and stage timers for the roll and render pipeline.
+
+    with metrics.timer("image.download"):
+        ...
+    metrics.inc("image.download.bytes", len(chunk))
+
+The app shows them in its debug panel, and the HTTP service serves them at
+/metrics in the Prometheus text format (/metrics?format=json for JSON).
+
+Set BTD6_METRICS=0 to switch everything off: timer() then hands back one
+shared no-op context manager and inc() returns straight away, so the
+instrumented code pays a function call and nothing else.
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+enabled = os.environ.get("BTD6_METRICS", "1") not in ("", "0")
+
+_NULL_TIMER = nullcontext()
+_lock = threading.Lock()
+_counters = {}
+_timers = {}  # name -> [count, total seconds, max seconds]
+
+
+def set_enabled(flag: bool):
+    global enabled
+    enabled = bool(flag)
+
+
+def inc(name: str, value=1):
+    """
+    Add value to the counter name (a count, or bytes for names ending in .bytes).
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name: str, seconds: float):
+    """
+    Record one timing for the stage name.
+    """
+    if not enabled:
+        return
+    with _lock:
+        stat = _timers.get(name)
+        if stat is None:
+            _timers[name] = [1, seconds, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            if seconds > stat[2]:
+                stat[2] = seconds
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def timer(name: str):
+    """
+    Context manager timing its body as one observation of the stage name.
+    """
+    return _Timer(name) if enabled else _NULL_TIMER
+
+
+def snapshot() -> dict:
+    """
+    {"counters": {name: value}, "timers": {name: {count, total_ms, mean_ms, max_ms}}}
+    """
+    with _lock:
+        counters = dict(_counters)
+        timers = {name: list(stat) for name, stat in _timers.items()}
+    return {
+        "enabled": enabled,
+        "counters": dict(sorted(counters.items())),
+        "timers": {
+            name: {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / count * 1000, 3),
+                "max_ms": round(peak * 1000, 3),
+            }
+            for name, (count, total, peak) in sorted(timers.items())
+        },
+    }
+
+
+def _metric_name(name: str) -> str:
+    return "btd6_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus() -> str:
+    """
+    The current values in the Prometheus text exposition format.
+    Counters become <name>_total, and timers a summary in seconds plus a max gauge.
+    """
+    with _lock:
+        counters = dict(_counters)
+        timers = {name: list(stat) for name, stat in _timers.items()}
+    lines = []
+    for name, value in sorted(counters.items()):
+        metric = _metric_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, (count, total, peak) in sorted(timers.items()):
+        metric = _metric_name(name) + "_seconds"
+        lines += [
+            f"# TYPE {metric} summary",
+            f"{metric}_count {count}",
+            f"{metric}_sum {total:.9f}",
+            f"# TYPE {metric}_max gauge",
+            f"{metric}_max {peak:.9f}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
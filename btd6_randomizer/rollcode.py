@@ -0,0 +1,108 @@
+"""
+Short shareable codes for a rolled setup, and for a mode/map/hero selection.
+
+A roll code packs the catalog indices of the mode, map, hero and towers into
+one mixed-radix integer, written in Crockford base32 after a one-character
+catalog version. Decoding rebuilds the setup directly, without sampling again.
+A selection code does the same for the three selection bitmasks.
+"""
+from .data import modes, maps, heroes, tower_order
+from .engine import ALL_HEROES, ALL_MAPS, ALL_MODES, HERO_ID, MAP_ID, MODE_ID, TOWER_RANK
+
+# Bump when the order or contents of the catalog lists change, so old codes
+# are rejected instead of decoding to a different setup.
+CODE_VERSION = "1"
+
+MAX_CODE_TOWERS = 31
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+DIGIT = {c: i for i, c in enumerate(ALPHABET)}
+# Crockford base32 reads the easily confused letters as digits
+DIGIT.update({"O": 0, "I": 1, "L": 1})
+
+
+def to_base32(value: int) -> str:
+    digits = []
+    while True:
+        value, d = divmod(value, 32)
+        digits.append(ALPHABET[d])
+        if not value:
+            break
+    return "".join(reversed(digits))
+
+
+def from_base32(code: str, label: str) -> int:
+    """
+    The integer in a versioned code; raises ValueError if it isn't one.
+    """
+    code = code.strip().upper().replace("-", "")
+    if not code.startswith(CODE_VERSION) or len(code) < 2:
+        raise ValueError(f"Not a {label} for this version of the randomizer.")
+    value = 0
+    for c in code[1:]:
+        if c not in DIGIT:
+            raise ValueError(f"Invalid character in {label}: {c!r}")
+        value = value * 32 + DIGIT[c]
+    return value
+
+
+def encode_roll(mode: str, map_choice, hero: str, towers) -> str:
+    """
+    The code for a setup as returned by randomize_btd6_setup.
+    """
+    if len(towers) > MAX_CODE_TOWERS:
+        raise ValueError(f"Roll codes hold at most {MAX_CODE_TOWERS} towers.")
+    map_name = map_choice["name"] if isinstance(map_choice, dict) else map_choice
+
+    value = 0
+    for tower in sorted(towers, key=TOWER_RANK.__getitem__, reverse=True):
+        value = value * len(tower_order) + TOWER_RANK[tower]
+    value = value * (MAX_CODE_TOWERS + 1) + len(towers)
+    value = value * len(heroes) + HERO_ID[hero]
+    value = value * len(maps) + MAP_ID[map_name]
+    value = value * len(modes) + MODE_ID[mode]
+    return CODE_VERSION + to_base32(value)
+
+
+def decode_roll(code: str):
+    """
+    The (mode, map, hero, towers) setup a code stands for.
+    Raises ValueError for malformed codes or codes from another catalog version.
+    """
+    value = from_base32(code, "roll code")
+    value, mode_id = divmod(value, len(modes))
+    value, map_id = divmod(value, len(maps))
+    value, hero_id = divmod(value, len(heroes))
+    value, tower_count = divmod(value, MAX_CODE_TOWERS + 1)
+    towers = []
+    for _ in range(tower_count):
+        value, tower_id = divmod(value, len(tower_order))
+        towers.append(tower_order[tower_id])
+    if value:
+        raise ValueError("Roll code is too long.")
+    return modes[mode_id], maps[map_id], heroes[hero_id], towers
+
+
+def encode_selection(mode_mask: int, map_mask: int, hero_mask: int) -> str:
+    """
+    The code for a selection of modes, maps and heroes given as bitmasks.
+    """
+    value = hero_mask & ALL_HEROES
+    value = value << len(maps) | map_mask & ALL_MAPS
+    value = value << len(modes) | mode_mask & ALL_MODES
+    return CODE_VERSION + to_base32(value)
+
+
+def decode_selection(code: str):
+    """
+    The (mode_mask, map_mask, hero_mask) a selection code stands for.
+    Raises ValueError for malformed codes or codes from another catalog version.
+    """
+    value = from_base32(code, "selection code")
+    mode_mask = value & ALL_MODES
+    value >>= len(modes)
+    map_mask = value & ALL_MAPS
+    value >>= len(maps)
+    if value > ALL_HEROES:
+        raise ValueError("Selection code is too long.")
+    return mode_mask, map_mask, value
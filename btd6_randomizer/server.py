@@ -0,0 +1,396 @@
+"""
+Small asyncio HTTP/JSON service for bots and overlays:
+
+    python -m btd6_randomizer.server --port 8765
+
+    GET  /roll?count=3&seed=1&mode=CHIMPS&map=Logs&hero=Quincy&towers=5&max_duplicates=1
+    GET  /roll/<code>          decode a roll code
+    GET  /draft?players=8&max_overlap=2&towers=5   setups with no shared map or hero (same filters as /roll)
+    POST /rolls                JSON list of /roll parameter objects, answered in one response
+    GET  /health               request count and latency percentiles against the p99 budget
+    GET  /metrics              stage timers and counters, Prometheus text (?format=json for JSON)
+
+Connections are kept alive (HTTP/1.1), and requests are answered without
+Streamlit: small rolls on the event loop, drafts, batches and rolls of more
+than INLINE_COUNT setups in the default thread pool, so they don't hold up
+the other clients. RandomizerService is also an ASGI app, so it can be
+mounted in another server instead of running standalone.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+import urllib.parse
+from collections import deque
+
+from . import metrics
+from .cli import draft_records, roll_setups
+from .data import modes, maps, heroes, maps_images, mode_images, hero_images, tower_images
+from .engine import MAP_BY_NAME
+from .images import DISPLAY_WIDTHS, scale_wiki_image
+from .rollcode import decode_roll, encode_roll
+
+log = logging.getLogger("btd6_randomizer.server")
+
+MAX_COUNT = 1000
+MAX_BATCH = 100
+INLINE_COUNT = 10
+P99_BUDGET_MS = 5.0
+
+KNOWN_NAMES = {
+    "mode": set(modes),
+    "map": set(MAP_BY_NAME),
+    "hero": set(heroes),
+}
+
+DECIMAL = re.compile(r"[+-]?[0-9]+")
+
+JSON_TYPE = "application/json"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4"
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class LatencyTracker:
+    """
+    Handling times of the most recent requests, for p50/p99 reporting.
+    """
+    def __init__(self, size=10000, budget_ms=P99_BUDGET_MS):
+        self.samples = deque(maxlen=size)
+        self.budget_ms = budget_ms
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    def report(self) -> dict:
+        p99 = self.percentile(0.99)
+        return {
+            "requests": self.count,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p99_ms": round(p99, 3),
+            "p99_budget_ms": self.budget_ms,
+            "within_budget": p99 <= self.budget_ms,
+        }
+
+
+def image_urls(record: dict) -> dict:
+    """
+    Wiki image URLs for a setup record, scaled to the widths the app uses.
+    """
+    def scaled(images, name, kind):
+        url = images.get(name)
+        return scale_wiki_image(url, DISPLAY_WIDTHS[kind]) if url else None
+
+    return {
+        "map": scaled(maps_images, record["map"], "map"),
+        "mode": scaled(mode_images, record["mode"], "mode"),
+        "hero": scaled(hero_images, record["hero"], "hero"),
+        "towers": [scaled(tower_images, t, "tower") for t in record["towers"]],
+    }
+
+
+def _int(params, key, default, low, high):
+    # JSON ints, or decimal strings from the query; floats and booleans would
+    # silently become a different value
+    value = params.get(key, default)
+    if isinstance(value, str) and DECIMAL.fullmatch(value):
+        value = int(value)
+    if type(value) is not int:
+        raise BadRequest(f"{key} must be an integer")
+    if not low <= value <= high:
+        raise BadRequest(f"{key} must be between {low} and {high}")
+    return value
+
+
+def _names(params, key):
+    names = params.get(key)
+    if names is None:
+        return None
+    if isinstance(names, str):
+        names = [names]
+    if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise BadRequest(f"{key} must be a name or a list of names")
+    unknown = [n for n in names if n not in KNOWN_NAMES[key]]
+    if unknown:
+        raise BadRequest(f"unknown {key}: {', '.join(unknown)}")
+    return names
+
+
+def roll(params: dict) -> dict:
+    """
+    Answer one /roll request; params are the decoded query or a POST /rolls item.
+    """
+    seed = params.get("seed")
+    if seed is not None:
+        seed = _int(params, "seed", None, 0, 2 ** 64 - 1)
+    try:
+        with metrics.timer("roll.sample"):
+            records = list(roll_setups(
+                count=_int(params, "count", 1, 1, MAX_COUNT),
+                seed=seed,
+                modes=_names(params, "mode"),
+                maps=_names(params, "map"),
+                heroes=_names(params, "hero"),
+                towers=_int(params, "towers", 5, 1, 25),
+                max_duplicates=_int(params, "max_duplicates", 1, 1, 10),
+            ))
+    except BadRequest:
+        raise
+    except ValueError as e:
+        raise BadRequest(str(e)) from None
+    for record in records:
+        record["images"] = image_urls(record)
+    return {"setups": records}
+
+
+def draft(params: dict) -> dict:
+    """
+    Answer one /draft request.
+    """
+    seed = params.get("seed")
+    if seed is not None:
+        seed = _int(params, "seed", None, 0, 2 ** 64 - 1)
+    towers = _int(params, "towers", 5, 1, 25)
+    try:
+        with metrics.timer("draft.solve"):
+            records = draft_records(
+                players=_int(params, "players", 2, 1, len(maps)),
+                seed=seed,
+                modes=_names(params, "mode"),
+                maps=_names(params, "map"),
+                heroes=_names(params, "hero"),
+                towers=towers,
+                max_duplicates=_int(params, "max_duplicates", 1, 1, 10),
+                max_overlap=_int(params, "max_overlap", 2, 0, towers),
+            )
+    except BadRequest:
+        raise
+    except ValueError as e:
+        raise BadRequest(str(e)) from None
+    for record in records:
+        record["images"] = image_urls(record)
+    return {"setups": records}
+
+
+class RandomizerService:
+    """
+    Routes requests to the randomizer. dispatch() is transport-agnostic; serve()
+    runs it as a standalone keep-alive HTTP server, and instances are ASGI apps.
+    """
+    def __init__(self, p99_budget_ms=P99_BUDGET_MS):
+        self.latency = LatencyTracker(budget_ms=p99_budget_ms)
+
+    def dispatch(self, method: str, target: str, body: bytes = b""):
+        """
+        Return (status, payload) for a request: a JSON-able object, or text
+        to send as is (/metrics).
+        """
+        url = urllib.parse.urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        try:
+            if path == "/roll":
+                if method != "GET":
+                    return 405, {"error": "use GET"}
+                query = urllib.parse.parse_qs(url.query)
+                params = {k: v if k in KNOWN_NAMES else v[-1] for k, v in query.items()}
+                return 200, roll(params)
+            if path == "/draft":
+                if method != "GET":
+                    return 405, {"error": "use GET"}
+                query = urllib.parse.parse_qs(url.query)
+                params = {k: v if k in KNOWN_NAMES else v[-1] for k, v in query.items()}
+                return 200, draft(params)
+            if path.startswith("/roll/"):
+                setup = decode_roll(urllib.parse.unquote(path[len("/roll/"):]))
+                record = {
+                    "mode": setup[0], "map": setup[1]["name"], "water": setup[1]["water"],
+                    "hero": setup[2], "towers": setup[3], "code": encode_roll(*setup),
+                }
+                record["images"] = image_urls(record)
+                return 200, {"setups": [record]}
+            if path == "/rolls":
+                if method != "POST":
+                    return 405, {"error": "use POST"}
+                try:
+                    batch = json.loads(body or b"[]")
+                except json.JSONDecodeError:
+                    raise BadRequest("body must be a JSON list") from None
+                if not isinstance(batch, list) or not all(isinstance(p, dict) for p in batch):
+                    raise BadRequest("body must be a JSON list of objects")
+                if len(batch) > MAX_BATCH:
+                    raise BadRequest(f"at most {MAX_BATCH} requests per batch")
+                return 200, {"results": [roll(params) for params in batch]}
+            if path == "/health":
+                return 200, {"status": "ok", **self.latency.report()}
+            if path == "/metrics":
+                if urllib.parse.parse_qs(url.query).get("format") == ["json"]:
+                    return 200, metrics.snapshot()
+                return 200, metrics.prometheus()
+            return 404, {"error": "not found"}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception:
+            log.exception("%s %s failed", method, target)
+            return 500, {"error": "internal error"}
+
+    @staticmethod
+    def offloaded(target: str) -> bool:
+        """
+        Whether a request is slow enough to run in the thread pool rather
+        than on the event loop: drafts, batches and large rolls.
+        """
+        url = urllib.parse.urlsplit(target)
+        path = url.path.rstrip("/")
+        if path in ("/draft", "/rolls"):
+            return True
+        if path == "/roll":
+            count = urllib.parse.parse_qs(url.query).get("count", ["1"])[-1]
+            return not (count.isdigit() and int(count) <= INLINE_COUNT)
+        return False
+
+    def respond(self, method: str, target: str, body: bytes = b""):
+        """
+        dispatch() plus latency bookkeeping; returns (status, body bytes, content type).
+        """
+        start = time.perf_counter()
+        return self._finish(start, *self.dispatch(method, target, body))
+
+    async def respond_async(self, method: str, target: str, body: bytes = b""):
+        """
+        respond() for the event loop: offloaded() requests are dispatched in
+        the default executor.
+        """
+        if not self.offloaded(target):
+            return self.respond(method, target, body)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        status, payload = await loop.run_in_executor(None, self.dispatch, method, target, body)
+        return self._finish(start, status, payload)
+
+    def _finish(self, start, status, payload):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), PROMETHEUS_TYPE
+        else:
+            data, content_type = json.dumps(payload).encode(), JSON_TYPE
+        elapsed = time.perf_counter() - start
+        self.latency.record(elapsed)
+        metrics.observe("http.request", elapsed)
+        metrics.inc(f"http.status.{status}")
+        if self.latency.count % 1000 == 0:
+            report = self.latency.report()
+            if not report["within_budget"]:
+                log.warning("p99 %.2f ms is over the %.2f ms budget", report["p99_ms"], report["p99_budget_ms"])
+        return status, data, content_type
+
+    # --- standalone HTTP/1.1 server ---
+    @staticmethod
+    async def _write(writer, status, data, content_type, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+            + data
+        )
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        key, _, value = line.decode("latin-1").partition(":")
+                        headers[key.strip().lower()] = value.strip().lower()
+                    length = int(headers.get("content-length", 0))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    error = json.dumps({"error": "malformed request"}).encode()
+                    await self._write(writer, 400, error, JSON_TYPE, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, data, content_type = await self.respond_async(method, target, body)
+                except Exception:
+                    log.exception("%s %s failed", method, target)
+                    status, data, content_type = 500, json.dumps({"error": "internal error"}).encode(), JSON_TYPE
+                connection = headers.get("connection", "")
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                await self._write(writer, status, data, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        log.info("Serving on http://%s:%d", host, port)
+        async with server:
+            await server.serve_forever()
+
+    # --- ASGI ---
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        target = scope["path"]
+        if scope.get("query_string"):
+            target += "?" + scope["query_string"].decode("latin-1")
+        status, data, content_type = await self.respond_async(scope["method"], target, body)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode()),
+                        (b"content-length", str(len(data)).encode())],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m btd6_randomizer.server",
+                                     description="Serve BTD6 randomizer rolls as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--p99-budget-ms", type=float, default=P99_BUDGET_MS,
+                        help="p99 request handling time reported as the budget by /health")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(RandomizerService(args.p99_budget_ms).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Weighted and recency-aware rolls.
+
+    weights = RollWeights(maps=difficulty_weights(maps_by_difficulty, {"Expert": 2}),
+                          recent=10)
+    setup = randomize_from_masks(..., weights=weights)
+    weights.record(*setup)
+
+Each section (modes, maps, heroes) has a WeightedPicker, which draws a catalog
+index from a selection bitmask in O(1) through a Walker alias table. Tables
+are built once per selection and only rebuilt when the weight of one of its
+items changes.
+
+Recency doesn't touch the tables. A draw that lands on an item from the last
+`recent` rolls is kept with probability recent_factor and redrawn otherwise,
+which is exact rejection sampling from weight * recent_factor. So recording
+a roll costs O(1), and a draw takes at most 1 / recent_factor tries on average.
+"""
+import random
+from collections import deque
+
+from .engine import HERO_ID, MAP_ID, MODE_ID, mask_ids
+
+# Masks a picker keeps tables for; a session rarely uses more than a few
+MAX_TABLES = 64
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table over items with the given weights; draw() is O(1).
+    Raises ValueError if no weight is positive.
+    """
+    __slots__ = ("items", "prob", "alias", "n")
+
+    def __init__(self, items, weights):
+        total = float(sum(weights))
+        if not items or total <= 0:
+            raise ValueError("At least one weight must be positive")
+        n = len(items)
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            lo, hi = small.pop(), large.pop()
+            prob[lo] = scaled[lo]
+            alias[lo] = hi
+            scaled[hi] -= 1.0 - scaled[lo]
+            (small if scaled[hi] < 1.0 else large).append(hi)
+        # Whatever is left is 1 up to rounding
+        self.items = tuple(items)
+        self.prob = prob
+        self.alias = alias
+        self.n = n
+
+    def draw(self, rng=random):
+        u = rng.random() * self.n
+        i = int(u)
+        return self.items[i if u - i < self.prob[i] else self.alias[i]]
+
+
+class WeightedPicker:
+    """
+    Weights over one catalog section; draws a catalog index from any bitmask
+    of it. Items start at weight 1.
+    """
+    def __init__(self, size: int, label: str, weights=None, recent=0, recent_factor=0.25):
+        if recent and not 0 < recent_factor <= 1:
+            raise ValueError("recent_factor must be in (0, 1]")
+        self.label = label
+        self.weights = [1.0] * size
+        self.recent_factor = recent_factor
+        self.history = deque(maxlen=recent) if recent else None
+        self._recent = {}   # catalog index -> times in history
+        self._tables = {}   # mask -> AliasTable
+        for i, weight in (weights or {}).items():
+            self.set_weight(i, weight)
+
+    def set_weight(self, i: int, weight: float):
+        if weight < 0:
+            raise ValueError(f"Weights can't be negative (got {weight})")
+        if self.weights[i] == weight:
+            return
+        self.weights[i] = float(weight)
+        bit = 1 << i
+        for mask in [m for m in self._tables if m & bit]:
+            del self._tables[mask]
+
+    def table(self, mask: int) -> AliasTable:
+        table = self._tables.get(mask)
+        if table is None:
+            ids = mask_ids(mask)
+            try:
+                table = AliasTable(ids, [self.weights[i] for i in ids])
+            except ValueError:
+                raise ValueError(f"Every selected {self.label} has weight 0.") from None
+            if len(self._tables) >= MAX_TABLES:
+                self._tables.clear()
+            self._tables[mask] = table
+        return table
+
+    def draw(self, mask: int, rng=random) -> int:
+        table = self.table(mask)
+        while True:
+            i = table.draw(rng)
+            if i not in self._recent or rng.random() < self.recent_factor:
+                return i
+
+    def record(self, i: int):
+        """
+        Note that i came up, for the recency penalty.
+        """
+        if self.history is None:
+            return
+        if len(self.history) == self.history.maxlen:
+            oldest = self.history[0]
+            self._recent[oldest] -= 1
+            if not self._recent[oldest]:
+                del self._recent[oldest]
+        self.history.append(i)
+        self._recent[i] = self._recent.get(i, 0) + 1
+
+
+class RollWeights:
+    """
+    Weights for randomize_from_masks: {name: weight} per section (default 1),
+    and a penalty of recent_factor for anything rolled in the last `recent`
+    rolls passed to record().
+    """
+    def __init__(self, modes=None, maps=None, heroes=None, recent=0, recent_factor=0.25):
+        self.mode = WeightedPicker(len(MODE_ID), "mode", _by_id(modes, MODE_ID, "mode"), recent, recent_factor)
+        self.map = WeightedPicker(len(MAP_ID), "map", _by_id(maps, MAP_ID, "map"), recent, recent_factor)
+        self.hero = WeightedPicker(len(HERO_ID), "hero", _by_id(heroes, HERO_ID, "hero"), recent, recent_factor)
+
+    def record(self, mode, map_choice, hero, towers=None):
+        """
+        Record a rolled setup (as randomize_from_masks returns it).
+        """
+        self.mode.record(MODE_ID[mode])
+        self.map.record(MAP_ID[map_choice["name"]])
+        self.hero.record(HERO_ID[hero])
+
+
+def _by_id(weights, index, label):
+    if not weights:
+        return None
+    unknown = [name for name in weights if name not in index]
+    if unknown:
+        raise ValueError(f"Unknown {label}: {', '.join(unknown)}")
+    return {index[name]: weight for name, weight in weights.items()}
+
+
+def difficulty_weights(groups: dict, weights: dict) -> dict:
+    """
+    {name: weight} for every name in groups (modes_by_difficulty or
+    maps_by_difficulty), weighted by its group; groups not in weights get 1.
+    """
+    return {name: weights.get(group, 1.0) for group, names in groups.items() for name in names}